@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        # creates the profiles and keeps their gravatar hash up to date
+        from . import signals  # noqa: F401
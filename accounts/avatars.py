@@ -0,0 +1,64 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Avatars: the Gravatar of the user's email, or a picture they uploaded.
+#
+# An upload is resized once to every size of AVATAR_SIZES, and the
+# thumbnails are named after the hash of the picture. A name never gets
+# another content, so a new upload simply gets new names.
+#
+# The thumbnails are plain files under MEDIA_ROOT/thumbs/, at MEDIA_URL.
+# Behind a web server, MEDIA_URL should be mapped to MEDIA_ROOT so it
+# serves them as static files, e.g. with nginx:
+#
+#     location /avatars/ { alias /srv/webBoard/avatars/; expires max; }
+#
+# The Procfile deployment has no web server in front of gunicorn, and
+# WhiteNoise only serves the files collected at startup, not uploads. There
+# accounts.views.avatar_thumbnail serves them through Django, with a one
+# year immutable Cache-Control and the hash as ETag, so a browser or a CDN
+# asks for a thumbnail once and a revalidation never opens the file.
+
+
+def gravatar_hash(email):
+    return hashlib.md5(email.strip().lower().encode('utf-8')).hexdigest()
+
+
+def gravatar_url(email_hash, size):
+    return 'https://www.gravatar.com/avatar/{}?d=mm&s={}'.format(email_hash, size)
+
+
+def thumbnail_size(size):
+    """The smallest thumbnail at least `size` pixels wide, or the largest one."""
+    sizes = sorted(settings.AVATAR_SIZES)
+    return next((s for s in sizes if s >= size), sizes[-1])
+
+
+def thumbnail_name(avatar_hash, size):
+    return 'thumbs/{}-{}.jpg'.format(avatar_hash, size)
+
+
+def make_thumbnails(image_file):
+    """
+    Writes the square thumbnails of an uploaded picture, cropped to its
+    center, and returns the hash naming them.
+    """
+    from PIL import Image, ImageOps
+
+    image_file.seek(0)
+    content = image_file.read()
+    avatar_hash = hashlib.sha1(content).hexdigest()[:16]
+    image = Image.open(BytesIO(content)).convert('RGB')
+    for size in settings.AVATAR_SIZES:
+        name = thumbnail_name(avatar_hash, size)
+        if default_storage.exists(name):
+            continue
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        output = BytesIO()
+        thumbnail.save(output, 'JPEG', quality=85, optimize=True)
+        default_storage.save(name, ContentFile(output.getvalue()))
+    return avatar_hash
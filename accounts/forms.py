@@ -2,10 +2,18 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+from .models import Profile
+
 
 class SignUpForm(UserCreationForm):
     email = forms.CharField(max_length=254, required=True, widget=forms.EmailInput())
 
     class Meta:
         model = User
-        fields = ('username', 'email', 'password1', 'password2')
\ No newline at end of file
+        fields = ('username', 'email', 'password1', 'password2')
+
+
+class AvatarForm(forms.ModelForm):
+    class Meta:
+        model = Profile
+        fields = ('avatar',)
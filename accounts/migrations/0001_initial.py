@@ -0,0 +1,41 @@
+# Generated by Django 2.1 on 2026-10-18 08:45
+
+import accounts.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from accounts.avatars import gravatar_hash
+
+
+def create_profiles(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Profile = apps.get_model('accounts', 'Profile')
+    users = User.objects.filter(profile__isnull=True).values_list('pk', 'email')
+    Profile.objects.bulk_create(
+        (Profile(user_id=pk, gravatar_hash=gravatar_hash(email)) for pk, email in users.iterator()),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gravatar_hash', models.CharField(editable=False, max_length=32)),
+                ('avatar', models.ImageField(blank=True, upload_to=accounts.models.avatar_upload_to)),
+                ('avatar_hash', models.CharField(blank=True, editable=False, max_length=16)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_profiles, migrations.RunPython.noop),
+    ]
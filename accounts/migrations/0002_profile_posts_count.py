@@ -0,0 +1,31 @@
+# Generated by Django 2.1 on 2026-10-18 15:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_posts(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    Post = apps.get_model('boards', 'Post')
+    author_posts = Post.objects.filter(created_by=OuterRef('user')).order_by().values('created_by')
+    Profile.objects.update(
+        posts_count=Coalesce(Subquery(author_posts.annotate(count=Count('pk')).values('count')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('boards', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
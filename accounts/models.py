@@ -1,3 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from django.db import models
 
-# Create your models here.
+from .avatars import gravatar_url, thumbnail_name, thumbnail_size
+
+
+def avatar_upload_to(profile, filename):
+    return '{}/{}'.format(profile.user.username, filename)
+
+
+# Stores what the avatar of a user needs, so it isn't computed again for
+# every post on every page.
+class Profile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
+    # md5 of the email, kept up to date by accounts/signals.py
+    gravatar_hash = models.CharField(max_length=32, editable=False)
+    avatar = models.ImageField(upload_to=avatar_upload_to, blank=True)
+    # names the thumbnails of the avatar, see accounts/avatars.py
+    avatar_hash = models.CharField(max_length=16, blank=True, editable=False)
+    # posts written, shown next to each of them. Kept up to date by
+    # boards/signals.py, recounted by `manage.py rebuild_board_counters`.
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return self.user.username
+
+    def get_avatar_url(self, size):
+        if self.avatar_hash:
+            return default_storage.url(thumbnail_name(self.avatar_hash, thumbnail_size(size)))
+        return gravatar_url(self.gravatar_hash, size)
@@ -0,0 +1,18 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .avatars import gravatar_hash
+from .models import Profile
+
+
+# Every user gets a Profile, and its gravatar hash follows the email.
+@receiver(post_save, sender=User)
+def update_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    # skip e.g. the last_login update of every login
+    if raw or (update_fields is not None and 'email' not in update_fields):
+        return
+    email_hash = gravatar_hash(instance.email)
+    profile, created = Profile.objects.get_or_create(user=instance, defaults={'gravatar_hash': email_hash})
+    if not created and profile.gravatar_hash != email_hash:
+        Profile.objects.filter(pk=profile.pk).update(gravatar_hash=email_hash)
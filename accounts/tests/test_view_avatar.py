@@ -0,0 +1,79 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from boards.templatetags.gravatar import gravatar
+from ..models import Profile
+
+
+def make_image(color='red', size=(300, 200)):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, 'PNG')
+    return SimpleUploadedFile('me.png', output.getvalue(), content_type='image/png')
+
+
+class GravatarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='john', email='John@Doe.com', password='123')
+
+    def test_profile_stores_the_hash(self):
+        self.assertEquals(self.user.profile.gravatar_hash, hashlib.md5(b'john@doe.com').hexdigest())
+
+    def test_hash_follows_the_email(self):
+        self.user.email = 'jane@doe.com'
+        self.user.save()
+        self.assertEquals(Profile.objects.get(user=self.user).gravatar_hash, hashlib.md5(b'jane@doe.com').hexdigest())
+
+    def test_displayed_size(self):
+        url = gravatar(User.objects.select_related('profile').get(pk=self.user.pk), 160)
+        self.assertEquals(url, 'https://www.gravatar.com/avatar/{}?d=mm&s=160'.format(self.user.profile.gravatar_hash))
+
+    def test_user_without_profile(self):
+        Profile.objects.all().delete()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertIn(hashlib.md5(b'john@doe.com').hexdigest(), gravatar(user, 40))
+
+
+class AvatarUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.client.login(username='john', password='123')
+        self.response = self.client.post(reverse('avatar'), {'avatar': make_image()})
+
+    def test_redirection(self):
+        self.assertRedirects(self.response, reverse('my_account'))
+
+    def test_thumbnails(self):
+        profile = Profile.objects.get(user=self.user)
+        self.assertEquals(len(profile.avatar_hash), 16)
+        url = gravatar(User.objects.select_related('profile').get(pk=self.user.pk), 100)
+        self.assertEquals(url, '/avatars/thumbs/{}-160.jpg'.format(profile.avatar_hash))
+
+        response = self.client.get(url)
+        self.assertEquals(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEquals(image.size, (160, 160))
+
+    def test_thumbnail_not_modified(self):
+        url = gravatar(User.objects.select_related('profile').get(pk=self.user.pk), 100)
+        first = self.client.get(url)
+        first.close()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEquals(response.status_code, 304)
+
+    def test_unknown_thumbnail(self):
+        response = self.client.get(reverse('avatar_thumbnail', kwargs={'name': '0123456789abcdef-160.jpg'}))
+        self.assertEquals(response.status_code, 404)
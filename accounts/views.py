@@ -1,8 +1,17 @@
-from django.shortcuts import render, redirect
+import re
+
 from django.contrib.auth import login as auth_login
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.shortcuts import render, redirect
+from django.views.decorators.http import etag
 
+from .avatars import make_thumbnails
+from .forms import AvatarForm, SignUpForm
+from .models import Profile
 
-from .forms import SignUpForm
+THUMBNAIL_NAME = re.compile(r'^[0-9a-f]{16}-\d+\.jpg$')
 
 
 def signup(request):
@@ -21,4 +30,32 @@ def signup(request):
             return redirect('home')
     else:
         form = SignUpForm()
-    return render(request, 'signup.html', {'form': form})
\ No newline at end of file
+    return render(request, 'signup.html', {'form': form})
+
+
+@login_required
+def avatar(request):
+    profile, _ = Profile.objects.get_or_create(user=request.user)
+    if request.method == 'POST':
+        form = AvatarForm(request.POST, request.FILES, instance=profile)
+        if form.is_valid():
+            profile = form.save(commit=False)
+            # the thumbnails are made once here, not when a page shows them
+            profile.avatar_hash = make_thumbnails(profile.avatar) if profile.avatar else ''
+            profile.save()
+            return redirect('my_account')
+    else:
+        form = AvatarForm(instance=profile)
+    return render(request, 'avatar.html', {'form': form, 'profile': profile})
+
+
+# the name changes with the picture, so it is its own ETag and the browsers
+# can keep it for good. Only used where no web server serves MEDIA_ROOT, see
+# accounts/avatars.py
+@etag(lambda request, name: name)
+def avatar_thumbnail(request, name):
+    if not THUMBNAIL_NAME.match(name) or not default_storage.exists('thumbs/' + name):
+        raise Http404
+    response = FileResponse(default_storage.open('thumbs/' + name), content_type='image/jpeg')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -1,8 +1,27 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+
+from .export import BoardExport
 from .models import Post, Topic, Board
 
+
+class BoardAdmin(admin.ModelAdmin):
+    actions = ['export_jsonl']
+
+    # streamed as it is read, see boards/export.py; `manage.py export_board`
+    # does the same to a file, with gzip and checkpoints
+    def export_jsonl(self, request, queryset):
+        def lines():
+            for board in queryset.order_by('pk'):
+                yield from BoardExport(board).stream()
+
+        response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="boards.jsonl"'
+        return response
+    export_jsonl.short_description = 'Export the selected boards to JSON Lines'
+
+
 # Register your models here.
 admin.site.register(Post)
 admin.site.register(Topic)
-admin.site.register(Board)
-
+admin.site.register(Board, BoardAdmin)
@@ -0,0 +1,127 @@
+from operator import attrgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.generic.list import BaseListView
+
+from .pagecache import page_etag
+from .views import (BoardListView, PostListView, TopicListView, board_topics_last_modified, board_topics_version,
+                    home_version, topic_posts_last_modified, topic_posts_version)
+
+# Read only JSON API of the boards, topics and posts. The views are the HTML
+# list views with another response: the same querysets (so the same joins
+# and stored counters, no query per row) and the same cursor pagination,
+# encoded as JSON instead of rendered through a template.
+#
+#     GET /boards/api/boards/3/topics/?fields=id,subject&limit=50&cursor=...
+#
+#     {"results":[{"id":12,"subject":"Hello"},...],"count":347,"next":"eyJk...","previous":null}
+#
+# `fields` picks the fields of every result (all of them by default), `limit`
+# the page size up to MAX_PAGE_SIZE and `next`/`previous` are the cursors of
+# the pages around.
+
+MAX_PAGE_SIZE = 100
+
+# results per chunk of the streamed response
+CHUNK_SIZE = 50
+
+
+def api_conditions(get_version, last_modified=None):
+    # the conditional GET of the HTML pages, but not their page cache: a
+    # streamed response can't be stored
+    return condition(
+        etag_func=lambda request, *args, **kwargs: page_etag(request, get_version(request, *args, **kwargs)),
+        last_modified_func=last_modified
+    )
+
+
+class JSONListMixin:
+    fields = {}  # name -> function of the object returning the value
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+    def get(self, request, *args, **kwargs):
+        names = [name for name in request.GET.get('fields', '').split(',') if name]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            return JsonResponse({'error': 'Unknown fields: {}'.format(', '.join(unknown))}, status=400)
+        self.selected_fields = names or list(self.fields)
+        return BaseListView.get(self, request, *args, **kwargs)
+
+    # always cursors, there are no page links to follow
+    def use_keyset_pagination(self):
+        return True
+
+    def get_paginate_by(self, queryset):
+        if self.paginate_by is None:
+            return None
+        try:
+            return max(1, min(int(self.request.GET.get('limit', self.paginate_by)), MAX_PAGE_SIZE))
+        except ValueError:
+            return self.paginate_by
+
+    def render_to_response(self, context, **response_kwargs):
+        # the rows are read here, inside the view and its replica scope (see
+        # boards/routers.py), only the encoding is streamed
+        objects = list(context['object_list'])
+        return StreamingHttpResponse(self.encode(objects, context.get('page_obj')), content_type='application/json')
+
+    def encode(self, objects, page):
+        getters = [(name, self.fields[name]) for name in self.selected_fields]
+        yield '{"results":['
+        for start in range(0, len(objects), CHUNK_SIZE):
+            chunk = objects[start:start + CHUNK_SIZE]
+            yield (',' if start else '') + ','.join(
+                self.encoder.encode({name: getter(obj) for name, getter in getters}) for obj in chunk
+            )
+        yield ']'
+        if page is not None:
+            yield ',"count":{},"next":{},"previous":{}'.format(
+                self.encoder.encode(page.paginator.count), self.encoder.encode(page.next_cursor),
+                self.encoder.encode(page.previous_cursor)
+            )
+        yield '}'
+
+
+@method_decorator(api_conditions(home_version), name='get')
+class BoardListAPIView(JSONListMixin, BoardListView):
+    fields = {
+        'id': attrgetter('pk'),
+        'name': attrgetter('name'),
+        'description': attrgetter('description'),
+        'topics_count': attrgetter('topics_count'),
+        'posts_count': attrgetter('posts_count'),
+        'last_post': attrgetter('last_post_id'),
+        'last_post_at': lambda board: board.last_post.created_at if board.last_post else None,
+        'last_post_by': lambda board: board.last_post.created_by.username if board.last_post else None,
+    }
+
+
+@method_decorator(api_conditions(board_topics_version, board_topics_last_modified), name='get')
+class TopicListAPIView(JSONListMixin, TopicListView):
+    fields = {
+        'id': attrgetter('pk'),
+        'subject': attrgetter('subject'),
+        'starter': attrgetter('starter.username'),
+        'views': attrgetter('views'),
+        'posts_count': attrgetter('posts_count'),
+        'last_updated': attrgetter('last_updated'),
+        'last_post': attrgetter('last_post_id'),
+    }
+
+
+@method_decorator(api_conditions(topic_posts_version, topic_posts_last_modified), name='get')
+class PostListAPIView(JSONListMixin, PostListView):
+    count_views = False
+
+    fields = {
+        'id': attrgetter('pk'),
+        'message': attrgetter('message'),
+        'message_html': lambda post: str(post.get_message_as_markdown()),
+        'created_at': attrgetter('created_at'),
+        'updated_at': attrgetter('updated_at'),
+        'created_by': attrgetter('created_by.username'),
+        'author_posts_count': attrgetter('author_posts_count'),
+    }
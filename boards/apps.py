@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BoardsConfig(AppConfig):
     name = 'boards'
+
+    def ready(self):
+        # connects the receivers that keep the denormalized counters up to date
+        from . import signals  # noqa: F401
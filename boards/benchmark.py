@@ -0,0 +1,296 @@
+import json
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .models import Board, Topic
+
+# Benchmark of the board views, run by `manage.py benchmark_views`.
+#
+# Every scenario requests one view a number of times, through the test client
+# (in-process, so the queries and their time are measured too) or over HTTP
+# against a running server such as a local gunicorn. The topics are picked
+# weighted by their posts count, like readers who mostly go to the busy ones.
+
+SCENARIOS = ('home', 'board_topics', 'topic_posts', 'reply_topic', 'new_topic', 'api_board_topics', 'api_topic_posts')
+READ_SCENARIOS = ('home', 'board_topics', 'topic_posts', 'api_board_topics', 'api_topic_posts')
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class QueryCounter:
+    """Counts the queries of the default connection and the time they take."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+
+
+class ViewBenchmark:
+    def __init__(self, requests=100, seed=0, url=None, username='benchmark'):
+        self.requests = requests
+        self.rng = random.Random(seed)
+        self.url = url.rstrip('/') if url else None
+        self.username = username
+
+    def setup(self):
+        self.boards = list(Board.objects.values_list('pk', flat=True))
+        topics = list(Topic.objects.order_by('-posts_count').values_list('pk', 'board_id', 'posts_count')[:1000])
+        if not self.boards or not topics:
+            raise ValueError('The database has no boards or topics, generate some first.')
+        self.topics = [topic[:2] for topic in topics]
+        self.topic_weights = [topic[2] for topic in topics]
+        if not self.url:
+            user, _ = User.objects.get_or_create(username=self.username, defaults={'email': 'benchmark@example.com'})
+            self.client = Client()
+            self.client.force_login(user)
+
+    def pick_topic(self):
+        return self.rng.choices(self.topics, weights=self.topic_weights)[0]
+
+    def make_request(self, scenario):
+        """Returns the method, path and data of a request of `scenario`."""
+        if scenario == 'home':
+            return 'get', reverse('home'), None
+        if scenario in ('board_topics', 'api_board_topics'):
+            return 'get', reverse(scenario, kwargs={'pk': self.rng.choice(self.boards)}), None
+        if scenario == 'new_topic':
+            data = {'subject': 'Benchmark topic', 'message': 'Benchmark **message**.'}
+            return 'post', reverse('new_topic', kwargs={'pk': self.rng.choice(self.boards)}), data
+
+        topic_pk, board_pk = self.pick_topic()
+        kwargs = {'pk': board_pk, 'topic_pk': topic_pk}
+        if scenario in ('topic_posts', 'api_topic_posts'):
+            return 'get', reverse(scenario, kwargs=kwargs), None
+        return 'post', reverse('reply_topic', kwargs=kwargs), {'message': 'Benchmark **reply**.'}
+
+    def run_scenario(self, scenario):
+        durations = []
+        queries = []
+        db_durations = []
+        for _ in range(self.requests):
+            method, path, data = self.make_request(scenario)
+            counter = QueryCounter()
+            start = time.perf_counter()
+            if self.url:
+                with urlopen(self.url + path) as response:
+                    response.read()
+                    status = response.status
+            else:
+                with connection.execute_wrapper(counter):
+                    response = getattr(self.client, method)(path, data)
+                    if response.streaming:
+                        # the test client leaves a stream to the caller
+                        b''.join(response.streaming_content)
+                status = response.status_code
+            durations.append(time.perf_counter() - start)
+            queries.append(counter.queries)
+            db_durations.append(counter.duration)
+            if status >= 400:
+                raise ValueError('{} {} returned {}'.format(method.upper(), path, status))
+
+        result = {
+            'requests': len(durations),
+            'p50': percentile(durations, 50) * 1000,
+            'p90': percentile(durations, 90) * 1000,
+            'p99': percentile(durations, 99) * 1000,
+        }
+        if not self.url:
+            result['queries'] = max(queries)
+            result['db'] = sum(db_durations) / len(db_durations) * 1000
+        return result
+
+    def run(self, scenarios=SCENARIOS):
+        if self.url:
+            # writes need a logged in session and a CSRF token
+            scenarios = [scenario for scenario in scenarios if scenario in READ_SCENARIOS]
+        # the test client uses "testserver" as host name
+        with override_settings(ALLOWED_HOSTS=['*']):
+            self.setup()
+            return {scenario: self.run_scenario(scenario) for scenario in scenarios}
+
+
+class ConcurrencyBenchmark:
+    """
+    Readers request topic pages while writers post replies as fast as they
+    can, each in its own thread and database connection, for `duration`
+    seconds. Shows whether the readers stall, or fail with "database is
+    locked", during the write bursts.
+    """
+
+    def __init__(self, readers=4, writers=2, duration=5.0, seed=0):
+        self.readers = readers
+        self.writers = writers
+        self.duration = duration
+        self.seed = seed
+
+    def worker(self, scenario, index, results):
+        benchmark = ViewBenchmark(seed='{}:{}:{}'.format(self.seed, scenario, index))
+        durations = []
+        errors = 0
+        try:
+            benchmark.setup()
+            if scenario == 'topic_posts':
+                benchmark.client.logout()
+            deadline = time.monotonic() + self.duration
+            while time.monotonic() < deadline:
+                method, path, data = benchmark.make_request(scenario)
+                start = time.perf_counter()
+                try:
+                    response = getattr(benchmark.client, method)(path, data)
+                    failed = response.status_code >= 400
+                except DatabaseError:
+                    failed = True
+                durations.append(time.perf_counter() - start)
+                errors += failed
+        finally:
+            # every thread has its own connection
+            connection.close()
+        results.append((scenario, durations, errors))
+
+    def run(self):
+        results = []
+        threads = [threading.Thread(target=self.worker, args=('topic_posts', i, results)) for i in range(self.readers)]
+        threads += [threading.Thread(target=self.worker, args=('reply_topic', i, results)) for i in range(self.writers)]
+        with override_settings(ALLOWED_HOSTS=['*']):
+            # the threads open their own connections, with the current settings
+            connection.close()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        summary = {}
+        for scenario in ('topic_posts', 'reply_topic'):
+            durations = [d for name, values, _ in results if name == scenario for d in values]
+            summary[scenario] = {
+                'requests': len(durations),
+                'errors': sum(errors for name, _, errors in results if name == scenario),
+                'p50': percentile(durations, 50) * 1000,
+                'p99': percentile(durations, 99) * 1000,
+                'max': max(durations, default=0) * 1000,
+            }
+        return summary
+
+
+class SlowClientBenchmark:
+    """
+    Readers request the read scenarios over HTTP from a running server for
+    `duration` seconds while `slow_clients` connections send their request
+    headers one line every `delay` seconds, like clients on a bad mobile
+    network. A sync gunicorn worker is held by a slow client for the whole
+    request; compare the readers' throughput with `--worker-class sync` and
+    with the gthread workers of the Procfile.
+    """
+
+    def __init__(self, url, clients=8, slow_clients=16, duration=10.0, delay=1.0, seed=0):
+        self.url = url.rstrip('/')
+        self.clients = clients
+        self.slow_clients = slow_clients
+        self.duration = duration
+        self.delay = delay
+        self.seed = seed
+
+    def reader(self, index, deadline, results):
+        benchmark = ViewBenchmark(seed='{}:{}'.format(self.seed, index), url=self.url)
+        benchmark.setup()
+        durations = []
+        errors = 0
+        try:
+            while time.monotonic() < deadline:
+                _, path, _ = benchmark.make_request(benchmark.rng.choice(READ_SCENARIOS))
+                start = time.perf_counter()
+                try:
+                    with urlopen(self.url + path, timeout=self.duration) as response:
+                        response.read()
+                except OSError:
+                    errors += 1
+                durations.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+        results.append((durations, errors))
+
+    def slow_client(self, deadline):
+        url = urlsplit(self.url)
+        try:
+            with socket.create_connection((url.hostname, url.port or 80), timeout=self.duration) as sock:
+                sock.sendall('GET / HTTP/1.1\r\nHost: {}\r\n'.format(url.netloc).encode())
+                # never finishes the headers before the end of the run
+                while time.monotonic() + self.delay < deadline:
+                    time.sleep(self.delay)
+                    sock.sendall(b'X-Slow: 1\r\n')
+        except OSError:
+            pass
+
+    def run(self):
+        results = []
+        deadline = time.monotonic() + self.duration
+        threads = [threading.Thread(target=self.slow_client, args=(deadline,)) for _ in range(self.slow_clients)]
+        threads += [threading.Thread(target=self.reader, args=(i, deadline, results)) for i in range(self.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        durations = [d for values, _ in results for d in values]
+        if len(results) < self.clients:
+            raise ValueError('A reader failed, is there a server at {}?'.format(self.url))
+        return {
+            'requests': len(durations),
+            'errors': sum(errors for _, errors in results),
+            'throughput': len(durations) / elapsed,
+            'p50': percentile(durations, 50) * 1000,
+            'p99': percentile(durations, 99) * 1000,
+        }
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Returns the regressions of `results` against `baseline`: a p90 more than
+    `tolerance` slower, or more queries per request than before.
+    """
+    regressions = []
+    for scenario, result in sorted(results.items()):
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        if result['p90'] > previous['p90'] * (1 + tolerance):
+            regressions.append('{}: p90 {:.1f}ms, was {:.1f}ms'.format(scenario, result['p90'], previous['p90']))
+        if 'queries' in result and 'queries' in previous and result['queries'] > previous['queries']:
+            regressions.append('{}: {} queries, was {}'.format(scenario, result['queries'], previous['queries']))
+    return regressions
@@ -0,0 +1,193 @@
+import contextlib
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from . import fragments
+from .models import MARKDOWN_VERSION, Board, Post, Topic, render_markdown, update_author_counters
+from .search import get_backend as get_search_backend
+
+# Bulk import of topics with their posts, e.g. from another forum software.
+#
+#     import_topics(board, [
+#         {'subject': 'Hello', 'views': 12, 'posts': [
+#             {'message': 'Hi!', 'created_by': john, 'created_at': datetime(2018, 5, 1, tzinfo=utc)},
+#             {'message': 'Welcome', 'created_by': jane, 'created_at': datetime(2018, 5, 2, tzinfo=utc)},
+#         ]},
+#     ])
+#
+# Every topic needs at least one post. The starter defaults to the author of
+# the first post and last_updated is the date of the last one.
+
+
+# values per `IN (...)` lookup, below SQLite's limit of 999
+IN_BATCH_SIZE = 500
+
+
+def in_batches(values, size=IN_BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+@contextlib.contextmanager
+def insert_transaction():
+    """
+    transaction.atomic() for the writes that allocate pks with
+    allocate_pks(), as the outermost block. On SQLite it takes the write
+    lock before anything is read, like BEGIN IMMEDIATE (which Django can't
+    issue): a concurrent writer waits for the commit instead of taking the
+    same pks, and in WAL mode the transaction never has to upgrade a read
+    snapshot that is out of date (SQLITE_BUSY_SNAPSHOT).
+    """
+    with transaction.atomic():
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                # a write that changes nothing still takes the lock
+                cursor.execute('UPDATE {0} SET id = id WHERE 0'.format(connection.ops.quote_name(Board._meta.db_table)))
+        yield
+
+
+# the largest pk plus one, without a lock: for a database no one else writes
+# to, like the one boards/synthetic.py fills
+def next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def allocate_pks(model, count):
+    """
+    `count` new pks for rows of `model`. PostgreSQL takes them from the
+    table's sequence, which is safe anywhere. The other databases take them
+    after the current largest pk, which is only safe inside
+    insert_transaction(): SQLite has its write lock, and on MySQL the
+    largest row is read FOR UPDATE, whose next-key lock also blocks the
+    inserts after it until the commit.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                           [model._meta.db_table, model._meta.pk.column, count])
+            return [row[0] for row in cursor.fetchall()]
+    last = model.objects.select_for_update().order_by('-pk').values_list('pk', flat=True).first()
+    first_pk = (last or 0) + 1
+    return list(range(first_pk, first_pk + count))
+
+
+def create_with_pks(model, objs, batch_size=None):
+    """
+    bulk_create that sets the pks of `objs`. PostgreSQL returns them, on
+    the other databases they come from allocate_pks(), so it belongs
+    inside insert_transaction().
+    """
+    if not connection.features.can_return_ids_from_bulk_insert:
+        for obj, pk in zip(objs, allocate_pks(model, len(objs))):
+            obj.pk = pk
+    model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+def insert_rows(model, fields, rows):
+    """
+    Inserts `rows`, tuples of the values of `fields` (attnames), and returns
+    their pks, allocated with allocate_pks() unless `fields` has the pk.
+
+    It is one executemany of the adapted values, without the model
+    instances and the per-field preparation of bulk_create, which cost more
+    than the INSERT itself on SQLite. The values are written as they are:
+    the dates of auto_now_add fields are kept, where save() and bulk_create
+    would replace them with the current time.
+    """
+    meta = model._meta
+    fields = list(fields)
+    if meta.pk.attname in fields:
+        pks = [row[fields.index(meta.pk.attname)] for row in rows]
+        values = [list(row) for row in rows]
+    else:
+        pks = allocate_pks(model, len(rows))
+        values = [[pk] + list(row) for pk, row in zip(pks, rows)]
+        fields = [meta.pk.attname] + fields
+    if not values:
+        return pks
+
+    datetimes = [i for i, name in enumerate(fields) if meta.get_field(name).get_internal_type() == 'DateTimeField']
+    adapt = connection.ops.adapt_datetimefield_value
+    for row in values:
+        for i in datetimes:
+            row[i] = adapt(row[i])
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(meta.db_table),
+        ', '.join(connection.ops.quote_name(meta.get_field(name).column) for name in fields),
+        ', '.join(['%s'] * len(fields))
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, values)
+    return pks
+
+
+def import_topics(board, topics, batch_size=500):
+    """
+    Creates the `topics` (dicts, see above) in `board` with bulk_create,
+    `batch_size` topics per transaction, and updates the board counters,
+    the search index and the fragment versions like the views do. Returns
+    the number of topics and posts created.
+    """
+    topics = iter(topics)
+    topics_count = posts_count = 0
+    while True:
+        batch = [topic for _, topic in zip(range(batch_size), topics)]
+        if not batch:
+            break
+        with insert_transaction():
+            created_posts = import_batch(board, batch)
+        topics_count += len(batch)
+        posts_count += created_posts
+    if topics_count:
+        fragments.bump('board', board.pk)
+        fragments.bump('home')
+    return topics_count, posts_count
+
+
+def import_batch(board, batch):
+    for data in batch:
+        if not data['posts']:
+            raise ValueError('The topic "{}" has no post.'.format(data['subject']))
+
+    # written as rows, so the given dates are kept (see insert_rows)
+    topic_pks = insert_rows(Topic, ('subject', 'board_id', 'starter_id', 'views', 'posts_count', 'last_updated'), [
+        (data['subject'], board.pk, (data.get('starter') or data['posts'][0]['created_by']).pk,
+         data.get('views', 0), len(data['posts']), max(post['created_at'] for post in data['posts']))
+        for data in batch
+    ])
+    posts = [
+        (topic_pk, post['created_by'].pk, post['created_at'], post['message'], render_markdown(post['message']),
+         MARKDOWN_VERSION)
+        for topic_pk, data in zip(topic_pks, batch) for post in data['posts']
+    ]
+    post_pks = insert_rows(
+        Post, ('topic_id', 'created_by_id', 'created_at', 'message', 'message_html', 'message_html_version'), posts
+    )
+
+    # the newest post of every topic, as (date, pk)
+    last_posts = {}
+    for pk, (topic_pk, _, created_at, *_) in zip(post_pks, posts):
+        last = last_posts.get(topic_pk)
+        if last is None or (created_at, pk) > last:
+            last_posts[topic_pk] = (created_at, pk)
+    # 3 variables a topic: its pk in the CASE and the IN, and the post's
+    for chunk in in_batches(last_posts.items(), IN_BATCH_SIZE // 3):
+        Topic.objects.filter(pk__in=[topic_pk for topic_pk, _ in chunk]).update(
+            last_post=Case(*[When(pk=topic_pk, then=Value(pk)) for topic_pk, (_, pk) in chunk])
+        )
+
+    last_post_date, last_post_pk = max(last_posts.values())
+    Board.objects.filter(pk=board.pk).update(
+        topics_count=F('topics_count') + len(topic_pks),
+        posts_count=F('posts_count') + len(posts)
+    )
+    # only if the import has the newest post of the board
+    Board.objects.filter(pk=board.pk).filter(
+        Q(last_post__isnull=True) | Q(last_post__created_at__lt=last_post_date)
+    ).update(last_post_id=last_post_pk)
+    update_author_counters({author for _, author, *_ in posts})
+    get_search_backend().index_topics(topic_pks)
+    return len(posts)
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.template.loader import render_to_string
+
+# Live updates of the topic pages: the new posts of a topic are pushed as
+# server-sent events to the readers on its last page (see topic_posts.html).
+#
+# reply_topic publishes the post to an in-process bus, rendered once for all
+# of the listeners. The bus is per process, so with several gunicorn workers
+# a listener only gets the replies posted through its own worker right away;
+# a stream ends after TOPIC_EVENTS_STREAM_SECONDS and the browser reconnects
+# with the Last-Event-ID header, which sends the posts it missed from the
+# database.
+#
+# On WSGI an open stream holds a server thread (see WEB_THREADS in the
+# Procfile) for as long as it lasts, idle or not, so a process can only
+# stream to a handful of readers: at most TOPIC_EVENTS_MAX_LISTENERS. The
+# other readers poll. Their response has the posts they missed and tells the
+# browser to come back in TOPIC_EVENTS_POLL_SECONDS; when the topic's
+# last_post is the one they have, that costs the topic query only. With
+# TOPIC_EVENTS_MAX_LISTENERS = 0 every reader polls and no thread is held.
+
+
+class Channel:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=50)  # (sequence, event id, data)
+        self.sequence = 0
+        self.listeners = 0
+
+    def publish(self, event_id, data):
+        with self.condition:
+            self.sequence += 1
+            self.events.append((self.sequence, event_id, data))
+            self.condition.notify_all()
+
+    def wait(self, position, timeout):
+        """
+        Returns the events published after `position` and the new position,
+        waiting at most `timeout` seconds for one.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > position, timeout)
+            events = [(event_id, data) for sequence, event_id, data in self.events if sequence > position]
+            return events, self.sequence
+
+
+class EventBus:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}  # topic pk -> Channel
+        self.listeners = 0
+
+    def has_listeners(self, topic_pk):
+        return topic_pk in self.channels
+
+    def publish(self, topic_pk, event_id, data):
+        channel = self.channels.get(topic_pk)
+        if channel is not None:
+            channel.publish(event_id, data)
+
+    def listen(self, topic_pk):
+        """Returns the channel of the topic, or None when there are too many listeners already."""
+        with self.lock:
+            if self.listeners >= settings.TOPIC_EVENTS_MAX_LISTENERS:
+                return None
+            self.listeners += 1
+            channel = self.channels.setdefault(topic_pk, Channel())
+            channel.listeners += 1
+            return channel
+
+    def close(self, topic_pk, channel):
+        with self.lock:
+            self.listeners -= 1
+            channel.listeners -= 1
+            if not channel.listeners:
+                del self.channels[topic_pk]
+
+
+bus = EventBus()
+
+
+def render_post(post, topic):
+    # rendered for no one in particular, the same HTML goes to every listener
+    return render_to_string('includes/post.html', {'post': post, 'topic': topic}).strip()
+
+
+def publish_post(post):
+    """Sends a new post to the listeners of its topic, if it has any."""
+    if not bus.has_listeners(post.topic_id):
+        return
+    # the author's posts_count was incremented in the database, see boards/signals.py
+    post.created_by = User.objects.select_related('profile').get(pk=post.created_by_id)
+    bus.publish(post.topic_id, post.pk, render_post(post, post.topic))
+
+
+def format_event(event_id, data, event='post'):
+    lines = ['id: {}'.format(event_id), 'event: {}'.format(event)]
+    lines += ['data: {}'.format(line) for line in data.splitlines()]
+    return '\n'.join(lines) + '\n\n'
+
+
+def missed_posts(topic, last_event_id):
+    """The posts of `topic` after the one with the pk `last_event_id`, up to a page."""
+    if last_event_id is None:
+        return []
+    posts = topic.posts.filter(pk__gt=last_event_id).select_related('created_by__profile').order_by('created_at', 'pk')
+    return posts[:settings.POSTS_PER_PAGE]
+
+
+def format_retry(seconds):
+    return 'retry: {}\n\n'.format(seconds * 1000)
+
+
+def stream_topic(topic, last_event_id=None):
+    """
+    The server-sent events of `topic`: the posts after `last_event_id` from
+    the database, then the new ones as they are published, for
+    TOPIC_EVENTS_STREAM_SECONDS. Past TOPIC_EVENTS_MAX_LISTENERS streams, a
+    poll: the posts after `last_event_id` only.
+    """
+    channel = bus.listen(topic.pk)
+    if channel is None:
+        yield format_retry(settings.TOPIC_EVENTS_POLL_SECONDS)
+        # the topic knows its last post, a reader that has it needs no query
+        if last_event_id is not None and (topic.last_post_id or 0) > last_event_id:
+            for post in missed_posts(topic, last_event_id):
+                yield format_event(post.pk, render_post(post, topic))
+        return
+    try:
+        # listening before the catch up query, a post published in between
+        # comes from both and is only sent once
+        position = channel.sequence
+        sent = set()
+        yield format_retry(settings.TOPIC_EVENTS_RETRY_SECONDS)
+        for post in missed_posts(topic, last_event_id):
+            sent.add(post.pk)
+            yield format_event(post.pk, render_post(post, topic))
+        # an idle stream doesn't need its database connection
+        if not connection.in_atomic_block:
+            connection.close()
+
+        deadline = time.monotonic() + settings.TOPIC_EVENTS_STREAM_SECONDS
+        while True:
+            timeout = min(settings.TOPIC_EVENTS_KEEPALIVE_SECONDS, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            events, position = channel.wait(position, timeout)
+            new_events = [(event_id, data) for event_id, data in events if event_id not in sent]
+            for event_id, data in new_events:
+                sent.add(event_id)
+                yield format_event(event_id, data)
+            if not new_events:
+                # a comment, so proxies don't close an idle connection
+                yield ': keepalive\n\n'
+    finally:
+        bus.close(topic.pk, channel)
@@ -0,0 +1,191 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from .models import Post
+
+# Export of a board with its topics, posts and their authors, run by
+# `manage.py export_board` and the admin action of the boards.
+#
+# JSON Lines has a record per line: the board, then the users, the topics and
+# the posts, each section in pk order and the references by pk (users by
+# username, which is what an import on another site resolves):
+#
+#     {"type":"board","id":3,"name":"Django","description":"..."}
+#     {"type":"user","id":12,"username":"john","email":"john@doe.com","date_joined":"2018-05-01T09:12:00+00:00"}
+#     {"type":"topic","id":7,"board":3,"subject":"Hello","starter":"john","views":12,"last_updated":"..."}
+#     {"type":"post","id":41,"topic":7,"created_by":"john","created_at":"...","updated_at":null,"message":"..."}
+#
+# CSV has a row per post, its topic and author included, for spreadsheets
+# and analytics. The rows are read with QuerySet.iterator() (a server-side
+# cursor on PostgreSQL), so the memory used doesn't depend on the size of the
+# board.
+
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ('board', 'topic', 'subject', 'post', 'created_by', 'created_at', 'updated_at', 'message')
+
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class BoardExport:
+    def __init__(self, board, format='jsonl', chunk_size=2000):
+        if format not in FORMATS:
+            raise ValueError('Unknown format "{}".'.format(format))
+        self.board = board
+        self.format = format
+        self.chunk_size = chunk_size
+
+    @property
+    def sections(self):
+        return ('board', 'users', 'topics', 'posts') if self.format == 'jsonl' else ('posts',)
+
+    def header(self):
+        if self.format == 'csv':
+            return self.to_csv([CSV_FIELDS])
+        return ''
+
+    def to_json(self, record):
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def to_csv(self, rows):
+        f = io.StringIO()
+        csv.writer(f).writerows(rows)
+        return f.getvalue()
+
+    def get_queryset(self, section):
+        if section == 'board':
+            return type(self.board).objects.filter(pk=self.board.pk)
+        if section == 'users':
+            authors = Post.objects.filter(topic__board=self.board).values('created_by')
+            return User.objects.filter(Q(pk__in=authors) | Q(pk__in=self.board.topics.values('starter')))
+        if section == 'topics':
+            return self.board.topics.select_related('starter')
+        posts = Post.objects.filter(topic__board=self.board).select_related('created_by')
+        return posts.select_related('topic') if self.format == 'csv' else posts
+
+    def to_record(self, section, obj):
+        if section == 'board':
+            return {'type': 'board', 'id': obj.pk, 'name': obj.name, 'description': obj.description}
+        if section == 'users':
+            return {'type': 'user', 'id': obj.pk, 'username': obj.username, 'email': obj.email,
+                    'date_joined': isoformat(obj.date_joined)}
+        if section == 'topics':
+            return {'type': 'topic', 'id': obj.pk, 'board': obj.board_id, 'subject': obj.subject,
+                    'starter': obj.starter.username, 'views': obj.views, 'last_updated': isoformat(obj.last_updated)}
+        return {'type': 'post', 'id': obj.pk, 'topic': obj.topic_id, 'created_by': obj.created_by.username,
+                'created_at': isoformat(obj.created_at), 'updated_at': isoformat(obj.updated_at),
+                'message': obj.message}
+
+    def to_row(self, post):
+        return [self.board.pk, post.topic_id, post.topic.subject, post.pk, post.created_by.username,
+                isoformat(post.created_at), isoformat(post.updated_at), post.message]
+
+    def chunks(self, section, after_pk=0):
+        """
+        Yields the rows of `section` after `after_pk` as (last pk, text)
+        pairs of `chunk_size` rows.
+        """
+        queryset = self.get_queryset(section).filter(pk__gt=after_pk).order_by('pk')
+        objs = []
+        for obj in queryset.iterator(chunk_size=self.chunk_size):
+            objs.append(obj)
+            if len(objs) == self.chunk_size:
+                yield objs[-1].pk, self.format_chunk(section, objs)
+                objs = []
+        if objs:
+            yield objs[-1].pk, self.format_chunk(section, objs)
+
+    def format_chunk(self, section, objs):
+        if self.format == 'csv':
+            return self.to_csv([self.to_row(post) for post in objs])
+        return ''.join(self.to_json(self.to_record(section, obj)) for obj in objs)
+
+    def stream(self):
+        """The whole export as text chunks, e.g. for a StreamingHttpResponse."""
+        yield self.header()
+        for section in self.sections:
+            for _, text in self.chunks(section):
+                yield text
+
+
+class Checkpoint:
+    """
+    Where an export to a file is at: the section, the last pk written and
+    the size of the file at that point, saved next to it after every chunk.
+    """
+
+    def __init__(self, path):
+        self.path = path + '.checkpoint'
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, data):
+        # written aside then renamed, an interruption never leaves half a file
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def export_to_file(export, path, compress=False, resume=False, log=None):
+    """
+    Writes `export` (a BoardExport) to `path`, gzipped if `compress`.
+    With `resume`, an export interrupted earlier continues from its
+    checkpoint instead of starting over. Returns the number of chunks
+    written.
+    """
+    checkpoint = Checkpoint(path)
+    state = checkpoint.load() if resume else None
+    expected = {'board': export.board.pk, 'format': export.format, 'compress': compress}
+    if state is not None and {key: state.get(key) for key in expected} != expected:
+        raise ValueError('The checkpoint of {} is for another export.'.format(path))
+
+    chunks = 0
+    with open(path, 'r+b' if state else 'wb') as f:
+        if state:
+            # whatever was written after the checkpoint is written again
+            f.truncate(state['offset'])
+            f.seek(state['offset'])
+            sections = export.sections[export.sections.index(state['section']):]
+        else:
+            write_chunk(f, export.header(), compress)
+            sections = export.sections
+
+        for section in sections:
+            after_pk = state['pk'] if state and section == state['section'] else 0
+            for last_pk, text in export.chunks(section, after_pk):
+                write_chunk(f, text, compress)
+                checkpoint.save(dict(expected, section=section, pk=last_pk, offset=f.tell()))
+                chunks += 1
+                if log:
+                    log('{} up to #{}'.format(section, last_pk))
+    checkpoint.delete()
+    return chunks
+
+
+def write_chunk(f, text, compress):
+    if not text:
+        return
+    data = text.encode()
+    if compress:
+        # every chunk is a gzip member of its own, so the file can be cut
+        # after any of them and appended to; gunzip reads them as one stream
+        data = gzip.compress(data)
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
@@ -0,0 +1,36 @@
+import uuid
+
+from django.core.cache import cache
+
+# Versions for the template fragment caches of home.html, topics.html and
+# topic_posts.html.
+#
+# A fragment key includes the version of what it shows ('home', a board or a
+# topic), and the receivers in boards/signals.py replace the version when a
+# write changes it. Old fragments are never deleted, nothing asks for their
+# key any more and the cache expires them. A version that was evicted from
+# the cache is simply replaced by a new one, so a stale fragment can't be
+# served again.
+
+
+def version_key(kind, pk):
+    return 'fragments:{}:{}'.format(kind, pk)
+
+
+def new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def get_version(kind, pk=0):
+    key = version_key(kind, pk)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        # don't overwrite a version set by a concurrent bump
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump(kind, *pks):
+    cache.set_many({version_key(kind, pk): new_version() for pk in pks or (0,)}, None)
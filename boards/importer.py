@@ -0,0 +1,276 @@
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from multiprocessing import Pool
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db.models import DateTimeField, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.avatars import gravatar_hash
+from accounts.models import Profile
+
+from . import fragments
+from .bulk import create_with_pks, in_batches, insert_rows, insert_transaction
+from .models import MARKDOWN_VERSION, Board, Post, Topic, render_markdown, update_author_counters
+from .search import get_backend as get_search_backend
+
+# Import of JSON Lines dumps from other forums, run by `manage.py
+# import_jsonl`. The records are those of boards/export.py:
+#
+#     {"type":"board","id":3,"name":"Django","description":"..."}
+#     {"type":"user","id":12,"username":"john","email":"john@doe.com"}
+#     {"type":"topic","id":7,"board":3,"subject":"Hello","starter":"john","views":12}
+#     {"type":"post","id":41,"topic":7,"created_by":"john","created_at":"2018-05-01T09:12:00+00:00","message":"..."}
+#
+# A record refers to boards and topics by their id in the dump and to users
+# by username, and comes after what it refers to. Boards are matched by
+# name and users by username, the users missing here are created without a
+# usable password. Topics and posts get the import_id "<source>:<id>", so
+# importing the same dump again skips what is already there.
+#
+# The records are written with bulk_create and insert_rows (see
+# boards/bulk.py), `batch_size` posts per transaction. Topic.last_updated,
+# posts_count and last_post, the board counters and the posts_count of the
+# authors are recomputed at the end, like `manage.py rebuild_board_counters`.
+
+RECORD_TYPES = ('board', 'user', 'topic', 'post')
+
+# the keys a record can't do without, the others have defaults
+REQUIRED_KEYS = {
+    'board': ('id', 'name'),
+    'user': ('username',),
+    'topic': ('id', 'board', 'subject', 'starter'),
+    'post': ('id', 'topic', 'created_by', 'message'),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def parse_date(value):
+    if not value:
+        return None
+    # datetime.fromisoformat (Python 3.7+) is many times faster, but
+    # doesn't read every ISO 8601 date
+    try:
+        return datetime.fromisoformat(value)
+    except (AttributeError, ValueError):
+        return parse_datetime(value)
+
+
+class JSONLImporter:
+    def __init__(self, source='import', batch_size=5000, render=True, index=True, workers=1, log=None):
+        self.source = source
+        self.batch_size = batch_size
+        self.render = render
+        self.index = index
+        self.workers = workers
+        self.log = log
+        self.stats = Counter()
+        self.pending = {kind: [] for kind in RECORD_TYPES}
+        # dump id -> pk, and username -> pk
+        self.boards = {}
+        self.topics = {}
+        self.users = {}
+        # the usernames of the user records, counted once in the stats
+        self.user_records = set()
+        self.touched_topics = set()
+        self.touched_boards = set()
+        self.touched_authors = set()
+        self.pool = None
+
+    def run(self, lines):
+        """Imports the records of `lines` (strings) and returns the stats: created and skipped per type."""
+        self.start = time.perf_counter()
+        if self.render and self.workers > 1:
+            self.pool = Pool(self.workers)
+        try:
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise InvalidRecord('Line {}: this is not JSON.'.format(number))
+                kind = record.get('type') if isinstance(record, dict) else None
+                if kind not in RECORD_TYPES:
+                    raise InvalidRecord('Line {}: unknown record type {!r}.'.format(number, kind))
+                missing = [key for key in REQUIRED_KEYS[kind] if record.get(key) is None]
+                if missing:
+                    raise InvalidRecord('Line {}: the {} has no {}.'.format(number, kind, ', '.join(missing)))
+                self.pending[kind].append((number, record))
+                if len(self.pending[kind]) >= self.batch_size:
+                    self.flush(kind)
+            self.flush('post')
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+        self.finish()
+        return self.stats
+
+    def flush(self, kind):
+        # what the records refer to goes first
+        for dependency in RECORD_TYPES[:RECORD_TYPES.index(kind) + 1]:
+            batch, self.pending[dependency] = self.pending[dependency], []
+            if batch:
+                with insert_transaction():
+                    getattr(self, 'import_{}s'.format(dependency))(batch)
+                self.progress(dependency)
+
+    def progress(self, kind):
+        if self.log:
+            elapsed = time.perf_counter() - self.start
+            self.log('{}s: {} created, {} skipped ({:.0f} posts/s)'.format(
+                kind, self.stats[kind + 's'], self.stats[kind + 's_skipped'],
+                self.stats['posts'] / elapsed if elapsed else 0
+            ))
+
+    def get(self, mapping, key, number, kind):
+        try:
+            return mapping[key]
+        except KeyError:
+            raise InvalidRecord('Line {}: unknown {} {!r}.'.format(number, kind, key))
+
+    def import_boards(self, batch):
+        existing = {}
+        for names in in_batches(record['name'] for _, record in batch):
+            existing.update(Board.objects.filter(name__in=names).values_list('name', 'pk'))
+        new_boards = {}
+        for _, record in batch:
+            if record['name'] not in existing and record['name'] not in new_boards:
+                new_boards[record['name']] = Board(name=record['name'], description=record.get('description', ''))
+        create_with_pks(Board, list(new_boards.values()))
+        existing.update((name, board.pk) for name, board in new_boards.items())
+        for _, record in batch:
+            self.boards[record['id']] = existing[record['name']]
+        self.stats['boards'] += len(new_boards)
+        self.stats['boards_skipped'] += len(batch) - len(new_boards)
+
+    def import_users(self, batch):
+        records = {record['username']: record for _, record in batch}
+        created = self.resolve_users(records)
+        # only the user records count, not the starters and authors
+        self.stats['users_skipped'] += len(set(records) - created - self.user_records)
+        self.user_records.update(records)
+
+    def resolve_users(self, records):
+        """
+        Adds the pks of the usernames `records` to self.users, creating the
+        missing users, and returns the usernames created.
+        """
+        missing = [username for username in records if username not in self.users]
+        for usernames in in_batches(missing):
+            self.users.update(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+        password = make_password(None)
+        users = [
+            User(username=username, email=records[username].get('email') or '', password=password,
+                 date_joined=parse_date(records[username].get('date_joined')) or timezone.now())
+            for username in missing if username not in self.users
+        ]
+        create_with_pks(User, users)
+        Profile.objects.bulk_create([Profile(user=user, gravatar_hash=gravatar_hash(user.email)) for user in users])
+        self.users.update((user.username, user.pk) for user in users)
+        self.stats['users'] += len(users)
+        return {user.username for user in users}
+
+    def skip_existing(self, model, batch, kind):
+        """The records of `batch` not imported yet; the others are added to self.topics if topics."""
+        for _, record in batch:
+            record['import_id'] = '{}:{}'.format(self.source, record['id'])
+        existing = {}
+        for import_ids in in_batches(record['import_id'] for _, record in batch):
+            existing.update(model.objects.filter(import_id__in=import_ids).values_list('import_id', 'pk'))
+        new_records = []
+        for number, record in batch:
+            if record['import_id'] in existing:
+                # already imported, or twice in the batch
+                self.stats[kind + '_skipped'] += 1
+                if model is Topic:
+                    self.topics[record['id']] = existing[record['import_id']]
+            else:
+                new_records.append((number, record))
+                existing[record['import_id']] = None
+        return new_records
+
+    def import_topics(self, batch):
+        batch = self.skip_existing(Topic, batch, 'topics')
+        self.resolve_users({record['starter']: {} for _, record in batch})
+        fields = ('subject', 'board_id', 'starter_id', 'views', 'posts_count', 'last_updated', 'import_id')
+        rows = [
+            (record['subject'], self.get(self.boards, record['board'], number, 'board'),
+             self.users[record['starter']], record.get('views', 0), 0,
+             # the date of the last post, if any, is set in finish()
+             parse_date(record.get('last_updated')) or EPOCH, record['import_id'])
+            for number, record in batch
+        ]
+        pks = insert_rows(Topic, fields, rows)
+        for (_, record), row, pk in zip(batch, rows, pks):
+            self.topics[record['id']] = pk
+            self.touched_topics.add(pk)
+            self.touched_boards.add(row[1])
+        self.stats['topics'] += len(rows)
+
+    def render_messages(self, messages):
+        # a dump has many identical short messages, each is rendered once
+        unique = list(set(messages))
+        if self.pool is not None:
+            rendered = self.pool.map(render_markdown, unique, chunksize=max(1, len(unique) // (self.workers * 4)))
+        else:
+            rendered = [render_markdown(message) for message in unique]
+        html = dict(zip(unique, rendered))
+        return [html[message] for message in messages]
+
+    def import_posts(self, batch):
+        batch = self.skip_existing(Post, batch, 'posts')
+        self.resolve_users({record['created_by']: {} for _, record in batch})
+        messages = [record['message'] for _, record in batch]
+        if self.render:
+            html, version = self.render_messages(messages), MARKDOWN_VERSION
+        else:
+            # left to `manage.py render_posts`, the views render them meanwhile
+            html, version = [''] * len(messages), 0
+        fields = ('topic_id', 'created_by_id', 'created_at', 'updated_at', 'message', 'message_html',
+                  'message_html_version', 'import_id')
+        rows = [
+            (self.get(self.topics, record['topic'], number, 'topic'), self.users[record['created_by']],
+             parse_date(record.get('created_at')) or timezone.now(), parse_date(record.get('updated_at')), message,
+             message_html, version, record['import_id'])
+            for (number, record), message, message_html in zip(batch, messages, html)
+        ]
+        # millions of rows, without the Post instances of bulk_create
+        insert_rows(Post, fields, rows)
+        self.touched_topics.update(row[0] for row in rows)
+        self.touched_authors.update(row[1] for row in rows)
+        self.stats['posts'] += len(rows)
+
+    def finish(self):
+        if not self.touched_topics:
+            return
+        last_post_dates = Post.objects.filter(topic=OuterRef('pk')).order_by().values('topic').annotate(
+            last=Max('created_at')
+        ).values('last')
+        for topic_pks in in_batches(self.touched_topics):
+            topics = Topic.objects.filter(pk__in=topic_pks)
+            topics.update(last_updated=Greatest(
+                Coalesce(Subquery(last_post_dates, output_field=DateTimeField()), F('last_updated')),
+                F('last_updated')
+            ))
+            self.touched_boards.update(topics.values_list('board_id', flat=True).distinct())
+            if self.index:
+                get_search_backend().index_topics(topic_pks)
+
+        # the posts and last post of the topics too
+        for board in Board.objects.filter(pk__in=self.touched_boards):
+            board.update_counters()
+        update_author_counters(self.touched_authors)
+        fragments.bump('board', *self.touched_boards)
+        fragments.bump('home')
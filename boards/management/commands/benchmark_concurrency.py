@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from boards.benchmark import ConcurrencyBenchmark
+
+# the SQLite defaults, before the SQLITE_PRAGMAS profile
+DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs readers of topic pages next to writers of replies, with the SQLITE_PRAGMAS profile '
+        'and, with --compare, with the SQLite defaults too. The writers post to the database, run it on a copy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run.')
+        parser.add_argument('--compare', action='store_true', help='Also run with the SQLite defaults.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The SQLite profile only applies to SQLite.')
+        profiles = [('tuned', settings.SQLITE_PRAGMAS)]
+        if options['compare']:
+            profiles.insert(0, ('defaults', DEFAULT_PRAGMAS))
+
+        self.stdout.write('{:<10}{:<14}{:>10}{:>8}{:>10}{:>10}{:>10}'.format(
+            'profile', 'scenario', 'requests', 'errors', 'p50 ms', 'p99 ms', 'max ms'))
+        for name, pragmas in profiles:
+            benchmark = ConcurrencyBenchmark(options['readers'], options['writers'], options['duration'],
+                                             options['seed'])
+            try:
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    results = benchmark.run()
+            except ValueError as e:
+                raise CommandError(e)
+            for scenario, result in results.items():
+                self.stdout.write('{:<10}{:<14}{:>10}{:>8}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+                    name, scenario, result['requests'], result['errors'], result['p50'], result['p99'], result['max']
+                ))
+        # back to the profile of the settings
+        connection.close()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.benchmark import SlowClientBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the throughput of readers of a running server while slow clients hold connections open. '
+        'Run it against gunicorn with the sync and with the gthread worker class to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', required=True, help='The server, e.g. http://127.0.0.1:8000.')
+        parser.add_argument('--clients', type=int, default=8, help='Readers requesting pages as fast as they can.')
+        parser.add_argument('--slow-clients', type=int, default=16)
+        parser.add_argument('--delay', type=float, default=1.0,
+                            help='Seconds between two header lines of a slow client.')
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        benchmark = SlowClientBenchmark(
+            options['url'], clients=options['clients'], slow_clients=options['slow_clients'],
+            duration=options['duration'], delay=options['delay'], seed=options['seed']
+        )
+        try:
+            result = benchmark.run()
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write('{:>10}{:>8}{:>12}{:>10}{:>10}'.format('requests', 'errors', 'requests/s', 'p50 ms', 'p99 ms'))
+        self.stdout.write('{:>10}{:>8}{:>12.1f}{:>10.1f}{:>10.1f}'.format(
+            result['requests'], result['errors'], result['throughput'], result['p50'], result['p99']
+        ))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.benchmark import SCENARIOS, ViewBenchmark, compare, load_baseline, save_baseline
+from boards.synthetic import ForumGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the latency and the queries per request of the board views. '
+        'The reply_topic and new_topic scenarios write to the database, run it on a local copy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+                            help='Only run this scenario, can be repeated.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per scenario.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--url', help='Run the read scenarios over HTTP against this server, e.g. '
+                                          'http://127.0.0.1:8000 for a local gunicorn.')
+        parser.add_argument('--populate', action='store_true',
+                            help='Generate data first, see the --boards, --users, --topics and --posts options.')
+        parser.add_argument('--boards', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--topics', type=int, default=100000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--baseline', help='JSON file of a previous run to compare against.')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results to the --baseline file.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='How much slower than the baseline p90 is a regression (0.2 is 20%%).')
+
+    def handle(self, *args, **options):
+        if options['populate']:
+            ForumGenerator(
+                boards=options['boards'], users=options['users'], topics=options['topics'],
+                posts=options['posts'], seed=options['seed'], log=self.stdout.write
+            ).generate()
+
+        benchmark = ViewBenchmark(requests=options['requests'], seed=options['seed'], url=options['url'])
+        try:
+            results = benchmark.run(options['scenarios'] or SCENARIOS)
+        except (ValueError, OSError) as e:
+            raise CommandError(e)
+
+        self.stdout.write('{:<18}{:>10}{:>10}{:>10}{:>10}{:>10}'.format('scenario', 'p50 ms', 'p90 ms', 'p99 ms',
+                                                                         'queries', 'db ms'))
+        for scenario, result in results.items():
+            self.stdout.write('{:<18}{:>10.1f}{:>10.1f}{:>10.1f}{:>10}{:>10}'.format(
+                scenario, result['p50'], result['p90'], result['p99'], result.get('queries', '-'),
+                '{:.1f}'.format(result['db']) if 'db' in result else '-'
+            ))
+
+        if not options['baseline']:
+            return
+        if options['save_baseline']:
+            save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS('Saved the baseline to {}.'.format(options['baseline'])))
+            return
+        regressions = compare(results, load_baseline(options['baseline']), options['tolerance'])
+        if regressions:
+            raise CommandError('Regressions against {}:\n{}'.format(options['baseline'], '\n'.join(regressions)))
+        self.stdout.write(self.style.SUCCESS('No regression against {}.'.format(options['baseline'])))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from boards.metrics import load_snapshots, reset_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Prints the request metrics per URL name collected by the running processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Start over after printing: the snapshot files are deleted and the running '
+                                 'processes drop their histograms at their next snapshot.')
+
+    def handle(self, *args, **options):
+        directory = settings.REQUEST_METRICS_DIR
+        histograms = load_snapshots(directory)
+        if not histograms:
+            self.stdout.write('No request metrics in {}.'.format(directory))
+            return
+
+        self.stdout.write('{:<24}{:>8}{:>9}{:>9}{:>9}{:>9}{:>9}{:>9}{:>9}{:>9}'.format(
+            'view', 'count', 'p50 ms', 'p90 ms', 'p99 ms', 'avg ms', 'queries', 'db ms', 'tpl ms', 'md ms'))
+        for name, histogram in sorted(histograms.items(), key=lambda item: -item[1].timings['total']):
+            self.stdout.write('{:<24}{:>8}{:>9}{:>9}{:>9}{:>9.1f}{:>9.1f}{:>9.1f}{:>9.1f}{:>9.1f}'.format(
+                name[:23], histogram.count, *['<={}'.format(histogram.percentile(p)) for p in (50, 90, 99)],
+                histogram.average('total'), histogram.queries / histogram.count, histogram.average('db'),
+                histogram.average('template'), histogram.average('markdown')
+            ))
+
+        if options['reset']:
+            reset_snapshots(directory)
+            self.stdout.write(self.style.SUCCESS('Reset the request metrics in {}.'.format(directory)))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.export import FORMATS, BoardExport, export_to_file
+from boards.models import Board
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports a board with its topics, posts and authors to JSON Lines or CSV, in constant memory. '
+        'An interrupted export continues where it stopped with --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', type=int)
+        parser.add_argument('output', help='The file to write, e.g. board-3.jsonl.gz.')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows read from the database and written between two checkpoints.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue from the checkpoint of an interrupted export of the same board.')
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(pk=options['board_id'])
+        except Board.DoesNotExist:
+            raise CommandError('There is no board {}.'.format(options['board_id']))
+
+        export = BoardExport(board, format=options['format'], chunk_size=options['chunk_size'])
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        try:
+            export_to_file(export, options['output'], compress=options['gzip'], resume=options['resume'], log=log)
+        except (ValueError, OSError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS('Exported "{}" to {}.'.format(board.name, options['output'])))
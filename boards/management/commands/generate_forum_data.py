@@ -0,0 +1,51 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from boards.synthetic import ForumGenerator
+
+
+def parse_until(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'), timezone.utc)
+    except ValueError:
+        raise CommandError('--until must be a date like 2019-01-31.')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates boards, users, topics and posts with bulk_create. The same --seed and --until '
+        'generate the same data, added to what the database already has.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boards', type=int, default=10)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--topics', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=20000, help='Posts in total, the first posts included.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--board-skew', type=float, default=1.2,
+                            help='Pareto shape of the topics per board, lower is more unequal.')
+        parser.add_argument('--topic-skew', type=float, default=1.2,
+                            help='Pareto shape of the replies per topic, lower is more unequal.')
+        parser.add_argument('--author-skew', type=float, default=1.2,
+                            help='Pareto shape of the posts per user, lower is more unequal.')
+        parser.add_argument('--days', type=int, default=365, help='How far back the posts go.')
+        parser.add_argument('--until', help='Date of the most recent posts (YYYY-MM-DD), now by default.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if min(options['boards'], options['users'], options['topics']) < 1:
+            raise CommandError('--boards, --users and --topics must be positive.')
+        until = parse_until(options['until']) if options['until'] else None
+
+        start = time.perf_counter()
+        ForumGenerator(
+            boards=options['boards'], users=options['users'], topics=options['topics'], posts=options['posts'],
+            seed=options['seed'], board_skew=options['board_skew'], topic_skew=options['topic_skew'],
+            author_skew=options['author_skew'], days=options['days'], until=until,
+            batch_size=options['batch_size'], log=self.stdout.write
+        ).generate()
+        self.stdout.write(self.style.SUCCESS('Generated the data in {:.1f}s.'.format(time.perf_counter() - start)))
@@ -0,0 +1,49 @@
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.importer import JSONLImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports boards, users, topics and posts from a JSON Lines dump, like the ones of export_board. '
+        'Importing the same dump again skips what is already there.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The dump, gzipped if it ends with .gz.')
+        parser.add_argument('--source', help='Name of the forum the dump comes from, the ids of its topics and '
+                                             'posts are unique within it. Defaults to the file name.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Records per transaction.')
+        parser.add_argument('--no-render', action='store_false', dest='render',
+                            help='Leave the markdown to `manage.py render_posts`, it is the slowest part.')
+        parser.add_argument('--no-index', action='store_false', dest='index',
+                            help='Leave the search index to `manage.py rebuild_search_index`.')
+        parser.add_argument('--workers', type=int, default=1, help='Processes rendering the markdown.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        source = options['source'] or os.path.basename(path).split('.')[0]
+        importer = JSONLImporter(
+            source=source, batch_size=options['batch_size'], render=options['render'], index=options['index'],
+            workers=options['workers'], log=self.stdout.write if options['verbosity'] > 0 else None
+        )
+        start = time.perf_counter()
+        try:
+            with (gzip.open if path.endswith('.gz') else open)(path, 'rt', encoding='utf-8') as f:
+                stats = importer.run(f)
+        except (ValueError, OSError) as e:
+            raise CommandError(e)
+        duration = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {boards} boards, {users} users, {topics} topics and {posts} posts in {duration:.1f}s '
+            '({rate:.0f} posts/s); {skipped} already there.'.format(
+                boards=stats['boards'], users=stats['users'], topics=stats['topics'], posts=stats['posts'],
+                duration=duration, rate=stats['posts'] / duration if duration else 0,
+                skipped=sum(count for name, count in stats.items() if name.endswith('_skipped'))
+            )
+        ))
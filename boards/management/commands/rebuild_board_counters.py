@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from boards.models import Board, update_author_counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts the posts, topics and last post stored on every board, and the posts of every author.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_ids', nargs='*', type=int, help='Only rebuild these boards.')
+
+    def handle(self, *args, **options):
+        boards = Board.objects.order_by('pk')
+        if options['board_ids']:
+            boards = boards.filter(pk__in=options['board_ids'])
+
+        count = 0
+        for board in boards:
+            board.update_counters()
+            count += 1
+        self.stdout.write(self.style.SUCCESS('Rebuilt counters for {} board(s).'.format(count)))
+        # the authors write in every board, they are recounted with all of them
+        if not options['board_ids']:
+            update_author_counters()
+            self.stdout.write(self.style.SUCCESS('Rebuilt the posts counters of the authors.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from boards.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Fills the full text search index again from the topics and posts.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the {} search index.'.format(backend.__class__.__name__)))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+
+from boards.models import MARKDOWN_VERSION, Post, render_markdown
+
+# posts per UPDATE, 4 variables each: below SQLite's limit of 999
+UPDATE_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = 'Renders the markdown of the posts whose stored HTML is missing or outdated.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Render every post, not only the outdated ones.')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by('pk')
+        if not options['all']:
+            posts = posts.exclude(message_html_version=MARKDOWN_VERSION)
+
+        last_pk = 0
+        count = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk).values_list('pk', 'message')[:options['batch_size']])
+            if not batch:
+                break
+            rendered = [(pk, message, render_markdown(message)) for pk, message in batch]
+            # one UPDATE ... CASE per batch instead of one UPDATE per post. A
+            # post edited since it was read keeps the HTML its save() rendered.
+            with transaction.atomic():
+                for start in range(0, len(rendered), UPDATE_BATCH_SIZE):
+                    chunk = rendered[start:start + UPDATE_BATCH_SIZE]
+                    unchanged = Q()
+                    for pk, message, html in chunk:
+                        unchanged |= Q(pk=pk, message=message)
+                    count += Post.objects.filter(unchanged).update(
+                        message_html=Case(*[When(pk=pk, then=Value(html)) for pk, message, html in chunk]),
+                        message_html_version=MARKDOWN_VERSION
+                    )
+            last_pk = batch[-1][0]
+            self.stdout.write('Rendered {} posts...'.format(count))
+
+        self.stdout.write(self.style.SUCCESS('Rendered {} post(s).'.format(count)))
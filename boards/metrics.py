@@ -0,0 +1,193 @@
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Timings of the current request, collected by RequestMetricsMiddleware (see
+# boards/middleware.py), and a histogram of them per URL name.
+#
+# Every process keeps its own histograms and writes them to a snapshot file
+# in REQUEST_METRICS_DIR at most every REQUEST_METRICS_SNAPSHOT_INTERVAL
+# seconds; `manage.py dump_request_metrics` merges the files of all the
+# processes. `dump_request_metrics --reset` writes a new generation marker
+# to the directory, and every process drops its histograms when it sees
+# the marker change at its next snapshot.
+
+# upper bounds in milliseconds of the latency buckets, the last one is open
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.timings = defaultdict(float)  # name -> seconds
+        self.active = set()
+
+    def add_query(self, duration):
+        self.queries += 1
+        self.timings['db'] += duration
+
+
+def start_request():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def end_request():
+    _local.metrics = None
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the block to `name` in the metrics of the current request, if any."""
+    metrics = current()
+    # a nested block of the same name (e.g. a template rendering another) is already timed
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+        metrics.active.discard(name)
+
+
+class Histogram:
+    def __init__(self, data=None):
+        data = data or {}
+        self.count = data.get('count', 0)
+        self.buckets = data.get('buckets', [0] * len(BUCKETS))
+        self.queries = data.get('queries', 0)
+        self.max_queries = data.get('max_queries', 0)
+        self.timings = defaultdict(float, data.get('timings', {}))  # name -> milliseconds in total
+
+    def add(self, duration, queries, timings):
+        self.count += 1
+        self.buckets[bisect.bisect_left(BUCKETS, duration * 1000)] += 1
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.timings['total'] += duration * 1000
+        for name, seconds in timings.items():
+            self.timings[name] += seconds * 1000
+
+    def merge(self, other):
+        self.count += other.count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.queries += other.queries
+        self.max_queries = max(self.max_queries, other.max_queries)
+        for name, milliseconds in other.timings.items():
+            self.timings[name] += milliseconds
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the percentile, in milliseconds."""
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return 0
+
+    def average(self, name):
+        return self.timings.get(name, 0) / self.count if self.count else 0
+
+    def as_dict(self):
+        return {'count': self.count, 'buckets': self.buckets, 'queries': self.queries,
+                'max_queries': self.max_queries, 'timings': dict(self.timings)}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(Histogram)  # URL name -> Histogram
+        self.last_snapshot = time.monotonic()
+        self.generation = None
+
+    def record(self, url_name, duration, metrics):
+        with self.lock:
+            self.histograms[url_name].add(duration, metrics.queries, metrics.timings)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def snapshot_path(self):
+        return os.path.join(settings.REQUEST_METRICS_DIR, 'metrics-{}.json'.format(os.getpid()))
+
+    def maybe_snapshot(self):
+        if time.monotonic() - self.last_snapshot >= settings.REQUEST_METRICS_SNAPSHOT_INTERVAL:
+            self.snapshot()
+
+    def snapshot(self):
+        generation = read_generation(settings.REQUEST_METRICS_DIR)
+        with self.lock:
+            if self.generation is not None and generation != self.generation:
+                # the metrics were reset since the last snapshot
+                self.histograms.clear()
+            self.generation = generation
+            data = {name: histogram.as_dict() for name, histogram in self.histograms.items()}
+            self.last_snapshot = time.monotonic()
+        if not settings.REQUEST_METRICS_DIR or not data:
+            return
+        os.makedirs(settings.REQUEST_METRICS_DIR, exist_ok=True)
+        path = self.snapshot_path()
+        # written aside then renamed, a reader never sees half a file
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+
+registry = MetricsRegistry()
+
+
+def read_generation(directory):
+    if not directory:
+        return ''
+    try:
+        with open(os.path.join(directory, 'generation')) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ''
+
+
+def reset_snapshots(directory):
+    """
+    Deletes the snapshot files of `directory` and starts a new generation, so
+    the running processes drop what they collected instead of writing it
+    again.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'generation.tmp'), 'w') as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(os.path.join(directory, 'generation.tmp'), os.path.join(directory, 'generation'))
+    for filename in os.listdir(directory):
+        if filename.startswith('metrics-'):
+            os.remove(os.path.join(directory, filename))
+
+
+def load_snapshots(directory):
+    """Merges the histograms of every snapshot file in `directory`."""
+    histograms = defaultdict(Histogram)
+    if not directory or not os.path.isdir(directory):
+        return histograms
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            for name, data in json.load(f).items():
+                histograms[name].merge(Histogram(data))
+    return histograms
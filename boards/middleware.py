@@ -0,0 +1,118 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger('boards.metrics')
+
+# Server-Timing metric names of the timings in boards/metrics.py
+TIMING_NAMES = (('db', 'db'), ('template', 'tpl'), ('markdown', 'md'))
+
+
+class QueryTimer:
+    def __init__(self, request_metrics):
+        self.request_metrics = request_metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.request_metrics.add_query(time.perf_counter() - start)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures every request: number of queries and database time, template
+    and markdown rendering time (see boards/metrics.py) and the total time.
+    They are sent in a Server-Timing header (when REQUEST_METRICS_SERVER_TIMING
+    is on), logged to the 'boards.metrics' logger and added to the histogram
+    of the URL name.
+
+    It should come first in MIDDLEWARE so the time of the other middleware
+    is included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                timer = QueryTimer(request_metrics)
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+            duration = time.perf_counter() - start
+        finally:
+            metrics.end_request()
+
+        match = request.resolver_match
+        url_name = match.url_name if match and match.url_name else '<unresolved>'
+        metrics.registry.record(url_name, duration, request_metrics)
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                ['{};dur={:.1f}'.format(header_name, request_metrics.timings[name] * 1000)
+                 for name, header_name in TIMING_NAMES] +
+                ['total;dur={:.1f};desc="{} queries"'.format(duration * 1000, request_metrics.queries)]
+            )
+        logger.info(
+            'method=%s view=%s status=%s duration=%.1f queries=%d db=%.1f template=%.1f markdown=%.1f',
+            request.method, url_name, response.status_code, duration * 1000, request_metrics.queries,
+            request_metrics.timings['db'] * 1000, request_metrics.timings['template'] * 1000,
+            request_metrics.timings['markdown'] * 1000,
+            extra={
+                'view': url_name, 'status': response.status_code, 'duration': duration * 1000,
+                'queries': request_metrics.queries, 'db': request_metrics.timings['db'] * 1000,
+                'template': request_metrics.timings['template'] * 1000,
+                'markdown': request_metrics.timings['markdown'] * 1000,
+            }
+        )
+        metrics.registry.maybe_snapshot()
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Pins the requests of a client to the primary database for
+    REPLICA_STICKY_SECONDS after one of its requests wrote to it, with a
+    cookie. See boards/routers.py.
+    """
+
+    cookie_name = 'pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request(pinned=self.cookie_name in request.COOKIES)
+        response = self.get_response(request)
+        if routers.has_written() and settings.DATABASE_REPLICAS:
+            response.set_cookie(self.cookie_name, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True)
+        return response
+
+
+class ViewedTopicsMiddleware:
+    """
+    Sets the viewed_topics cookie of the topic pages (see ViewedTopics in
+    boards/viewcount.py). It is set here, once the response is rendered,
+    because anonymous_page_cache stores the page while it is rendered: a
+    cookie set by the view would go to every visitor served from the cache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        viewed_topics = getattr(request, 'viewed_topics', None)
+        if viewed_topics is not None and viewed_topics.changed and response.status_code in (200, 304):
+            viewed_topics.set_cookie(response)
+        return response
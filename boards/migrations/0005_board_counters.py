@@ -0,0 +1,41 @@
+# Generated by Django 2.1 on 2026-10-18 08:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_board_counters(apps, schema_editor):
+    Board = apps.get_model('boards', 'Board')
+    Post = apps.get_model('boards', 'Post')
+    for board in Board.objects.all():
+        posts = Post.objects.filter(topic__board=board)
+        board.posts_count = posts.count()
+        board.topics_count = board.topics.count()
+        board.last_post = posts.order_by('-created_at').first()
+        board.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0004_auto_20180919_1224'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='last_post',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='boards.Post'),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='topics_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_board_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.1 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_board_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='message_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='message_html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
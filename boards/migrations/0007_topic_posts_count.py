@@ -0,0 +1,30 @@
+# Generated by Django 2.1 on 2026-10-18 08:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_topic_posts_count(apps, schema_editor):
+    Topic = apps.get_model('boards', 'Topic')
+    Post = apps.get_model('boards', 'Post')
+    topic_posts = Post.objects.filter(topic=OuterRef('pk')).order_by().values('topic')
+    Topic.objects.update(
+        posts_count=Coalesce(Subquery(topic_posts.annotate(count=Count('pk')).values('count')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_post_message_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_topic_posts_count, migrations.RunPython.noop),
+    ]
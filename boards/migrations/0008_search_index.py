@@ -0,0 +1,50 @@
+# Generated by Django 2.1 on 2026-10-18 09:02
+
+from django.db import OperationalError, migrations
+
+
+# The full text index depends on the database, see boards/search.py.
+# Other databases use the in-process index and need nothing here.
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE boards_post_fts USING fts5(subject, message, board_id UNINDEXED)'
+            )
+        except OperationalError:
+            # SQLite built without FTS5, search falls back to the in-process index
+            return
+        schema_editor.execute(
+            'INSERT INTO boards_post_fts (rowid, subject, message, board_id) '
+            'SELECT p.id, t.subject, p.message, t.board_id '
+            'FROM boards_post p INNER JOIN boards_topic t ON t.id = p.topic_id'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE boards_post ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            "UPDATE boards_post p SET search_vector = "
+            "setweight(to_tsvector('english', t.subject), 'A') || "
+            "setweight(to_tsvector('english', p.message), 'B') "
+            "FROM boards_topic t WHERE t.id = p.topic_id"
+        )
+        schema_editor.execute('CREATE INDEX boards_post_search_vector ON boards_post USING GIN (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS boards_post_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE boards_post DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0007_topic_posts_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
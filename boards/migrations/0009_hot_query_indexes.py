@@ -0,0 +1,21 @@
+# Generated by Django 2.1 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['topic', 'created_at', 'id'], name='boards_post_topic_created'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', 'last_updated', 'id'], name='boards_topic_board_updated'),
+        ),
+    ]
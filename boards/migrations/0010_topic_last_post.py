@@ -0,0 +1,28 @@
+# Generated by Django 2.1 on 2026-10-18 08:55
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_topic_last_post(apps, schema_editor):
+    Topic = apps.get_model('boards', 'Topic')
+    Post = apps.get_model('boards', 'Post')
+    last_posts = Post.objects.filter(topic=OuterRef('pk')).order_by('-created_at', '-pk').values('pk')[:1]
+    Topic.objects.update(last_post=Subquery(last_posts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='last_post',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='boards.Post'),
+        ),
+        migrations.RunPython(fill_topic_last_post, migrations.RunPython.noop),
+    ]
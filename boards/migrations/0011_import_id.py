@@ -0,0 +1,23 @@
+# Generated by Django 2.1 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0010_topic_last_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='import_id',
+            field=models.CharField(editable=False, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='import_id',
+            field=models.CharField(editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
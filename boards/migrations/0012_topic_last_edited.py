@@ -0,0 +1,29 @@
+# Generated by Django 2.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def fill_topic_last_edited(apps, schema_editor):
+    Topic = apps.get_model('boards', 'Topic')
+    Post = apps.get_model('boards', 'Post')
+    last_edits = Post.objects.filter(topic=OuterRef('pk')).order_by().values('topic').annotate(
+        last=Max('updated_at')
+    ).values('last')
+    Topic.objects.update(last_edited=Subquery(last_edits))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0011_import_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='last_edited',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_topic_last_edited, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.1 on 2026-10-18 14:40
+
+from django.db import migrations
+
+
+# boards_post_fts again, with board_id indexed: the board filter of a search
+# becomes a term of the MATCH instead of a check of every match, see
+# SQLiteSearchBackend in boards/search.py.
+def index_board(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = 'boards_post_fts'")
+        if cursor.fetchone() is None:
+            # SQLite built without FTS5, see migration 0008
+            return
+    schema_editor.execute('DROP TABLE boards_post_fts')
+    schema_editor.execute('CREATE VIRTUAL TABLE boards_post_fts USING fts5(subject, message, board_id)')
+    schema_editor.execute(
+        'INSERT INTO boards_post_fts (rowid, subject, message, board_id) '
+        'SELECT p.id, t.subject, p.message, t.board_id '
+        'FROM boards_post p INNER JOIN boards_topic t ON t.id = p.topic_id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0012_topic_last_edited'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_board, migrations.RunPython.noop),
+    ]
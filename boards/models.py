@@ -1,5 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, router
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
 
 from django.utils.text import Truncator
 
@@ -8,11 +12,37 @@ from markdown import markdown
 
 import math
 
+from accounts.models import Profile
+
+from .metrics import timed
+
+
+# Bump this whenever the markdown rendering changes (new extensions, upgrade of
+# the Markdown package...) so the stored HTML gets rendered again.
+# `manage.py render_posts` re-renders the posts saved with an older version.
+MARKDOWN_VERSION = 1
+
+
+def supports_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35, 0)
+
+
+def render_markdown(text):
+    with timed('markdown'):
+        return markdown(text, safe_mode='escape')
+
 
 # for the Board
 class Board(models.Model):
     name = models.CharField(max_length=25, unique=True)
     description = models.CharField(max_length=120)
+    # denormalized statistics for the home page, kept up to date by the
+    # handlers in boards/signals.py. Rebuild them with `manage.py rebuild_board_counters`.
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    topics_count = models.PositiveIntegerField(default=0, editable=False)
+    last_post = models.ForeignKey('Post', null=True, related_name='+', on_delete=models.SET_NULL, editable=False)
 
     def __str__(self):
         return self.name
@@ -21,7 +51,34 @@ class Board(models.Model):
         return Post.objects.filter(topic__board=self).count()
 
     def get_last_post(self):
-        return Post.objects.filter(topic__board=self).order_by('-created_at').first()
+        # the last post of the topic updated last, one row read from the
+        # boards_topic_board_updated index instead of sorting every post. A
+        # topic being deleted has no last post (SET_NULL) but may still be
+        # the newest one, see post_deleted in boards/signals.py.
+        topic = self.topics.filter(last_post__isnull=False).select_related('last_post').order_by(
+            '-last_updated', '-pk'
+        ).first()
+        return topic.last_post if topic else None
+
+    # recounts everything from scratch, the topics' posts_count and last_post
+    # included; used for repair
+    def update_counters(self):
+        topic_posts = Post.objects.filter(topic=OuterRef('pk')).order_by().values('topic')
+        self.topics.update(
+            posts_count=Coalesce(Subquery(topic_posts.annotate(count=Count('pk')).values('count')), 0),
+            last_post=Subquery(
+                Post.objects.filter(topic=OuterRef('pk')).order_by('-created_at', '-pk').values('pk')[:1]
+            ),
+            last_edited=Subquery(topic_posts.annotate(last=Max('updated_at')).values('last'))
+        )
+        self.posts_count = self.get_posts_count()
+        self.topics_count = self.topics.count()
+        self.last_post = Post.objects.filter(topic__board=self).order_by('-created_at', '-pk').first()
+        Board.objects.filter(pk=self.pk).update(
+            posts_count=self.posts_count,
+            topics_count=self.topics_count,
+            last_post=self.last_post
+        )
 
 
 # for the Topic
@@ -32,13 +89,34 @@ class Topic(models.Model):
     board = models.ForeignKey(Board, related_name='topics', on_delete=models.CASCADE)
     starter = models.ForeignKey(User, related_name='topics', on_delete=models.CASCADE)
     views = models.PositiveIntegerField(default=0)  # for the topic_posts
+    # number of posts, the first one included, and the newest post. Kept up
+    # to date by boards/signals.py
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    last_post = models.ForeignKey('Post', null=True, related_name='+', on_delete=models.SET_NULL, editable=False)
+    # when one of the posts was last edited or deleted, the topic page's
+    # Last-Modified is the later of this and last_updated
+    last_edited = models.DateTimeField(null=True, editable=False)
+    # "<source>:<id>" of a topic imported from another forum, so importing
+    # it again skips it (see boards/importer.py)
+    import_id = models.CharField(max_length=100, null=True, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # the topics of a board, newest first (TopicListView). Scanned
+            # backwards, the index also gives the id tie-breaker in order.
+            models.Index(fields=['board', 'last_updated', 'id'], name='boards_topic_board_updated'),
+        ]
 
     def __str__(self):
         return self.subject
 
+    # the first post is the topic itself, the rest are replies
+    @property
+    def replies(self):
+        return max(self.posts_count - 1, 0)
+
     def get_page_count(self):
-        count = self.posts.count()
-        pages = count/20
+        pages = self.posts_count / settings.POSTS_PER_PAGE
         return math.ceil(pages)
 
     def has_many_pages(self, count=None):
@@ -52,8 +130,38 @@ class Topic(models.Model):
             return range(1,5)
         return range(1, count + 1)
 
+    # the authors come in the same query
     def get_last_three_post(self):
-        return self.posts.order_by('-created_at')[:3]
+        return self.posts.select_related('created_by').order_by('-created_at', '-pk')[:3]
+
+    def record_post(self, post):
+        """
+        Counts a new post of the topic and, unless it is older than the last
+        one, makes it the last post and moves last_updated forward to its
+        date, in a single conditional UPDATE. Where the database supports
+        RETURNING (PostgreSQL, SQLite 3.35+) the new posts_count comes back
+        with it, otherwise it is read again.
+        """
+        connection = connections[router.db_for_write(Topic, instance=self)]
+        # every expression sees the values from before the UPDATE
+        sql = (
+            'UPDATE {table} SET posts_count = posts_count + 1, '
+            'last_post_id = CASE WHEN last_updated <= %s OR last_post_id IS NULL THEN %s ELSE last_post_id END, '
+            'last_updated = CASE WHEN last_updated < %s THEN %s ELSE last_updated END '
+            'WHERE id = %s'
+        ).format(table=connection.ops.quote_name(self._meta.db_table))
+        value = connection.ops.adapt_datetimefield_value(post.created_at)
+        params = [value, post.pk, value, value, self.pk]
+        with connection.cursor() as cursor:
+            if supports_returning(connection):
+                cursor.execute(sql + ' RETURNING posts_count', params)
+                self.posts_count = cursor.fetchone()[0]
+            else:
+                cursor.execute(sql, params)
+                self.refresh_from_db(fields=['posts_count'])
+        if self.last_updated <= post.created_at or self.last_post_id is None:
+            self.last_post = post
+        self.last_updated = max(self.last_updated, post.created_at)
 
 
 # for the Post
@@ -66,14 +174,60 @@ class Post(models.Model):
     created_by = models.ForeignKey(User, related_name='posts', on_delete=models.CASCADE)
     # This instructs Django that we don’t need this reverse relationship, so it will ignore it.
     updated_by = models.ForeignKey(User, null=True, related_name='+', on_delete=models.CASCADE)
+    # the message rendered to HTML when the post is saved, and the
+    # MARKDOWN_VERSION it was rendered with
+    message_html = models.TextField(blank=True, editable=False)
+    message_html_version = models.PositiveSmallIntegerField(default=0, editable=False)
+    # like Topic.import_id
+    import_id = models.CharField(max_length=100, null=True, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # the posts of a topic in order (PostListView)
+            models.Index(fields=['topic', 'created_at', 'id'], name='boards_post_topic_created'),
+        ]
 
     def __str__(self):
         truncated_message = Truncator(self.message)
         return truncated_message.chars(30)
 
+    def save(self, *args, **kwargs):
+        self.render_message()
+        super().save(*args, **kwargs)
+
+    def render_message(self):
+        self.message_html = render_markdown(self.message)
+        self.message_html_version = MARKDOWN_VERSION
+
+    # the counter of the author's profile, select it with the post
+    # (select_related('created_by__profile')) to avoid a query per post
+    @property
+    def author_posts_count(self):
+        try:
+            return self.created_by.profile.posts_count
+        except ObjectDoesNotExist:
+            # users created before their profile, e.g. by bulk_create
+            return 0
+
     # to be used in topic_post and reply_topic template
     def get_message_as_markdown(self):
-        return mark_safe(markdown(self.message, safe_mode='escape'))
+        if self.message_html_version != MARKDOWN_VERSION:
+            # not backfilled yet, render it for this request only
+            return mark_safe(render_markdown(self.message))
+        return mark_safe(self.message_html)
+
+
+def update_author_counters(user_pks=None):
+    """Recounts Profile.posts_count, of the users of `user_pks` or of everyone."""
+    author_posts = Post.objects.filter(created_by=OuterRef('user')).order_by().values('created_by')
+    posts_count = Coalesce(Subquery(author_posts.annotate(count=Count('pk')).values('count')), 0)
+    if user_pks is None:
+        Profile.objects.update(posts_count=posts_count)
+        return
+    user_pks = list(user_pks)
+    # below SQLite's limit of 999 variables
+    for start in range(0, len(user_pks), 500):
+        Profile.objects.filter(user__in=user_pks[start:start + 500]).update(posts_count=posts_count)
 
 
 """
@@ -0,0 +1,51 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def page_etag(request, version):
+    """
+    ETag of a page from the version of the rows it shows (see the version
+    functions of boards/views.py). The user is part of it because logged in
+    users get their own navbar and edit links.
+    """
+    value = '{}:{}:{}'.format(version, request.user.pk, request.get_full_path())
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def anonymous_page_cache(get_version):
+    """
+    Caches whole responses for logged out users, for
+    ANONYMOUS_PAGE_CACHE_TIMEOUT seconds (0 turns it off).
+
+    `get_version(request, *args, **kwargs)` returns the version of the rows
+    the page shows. It is part of the cache key, so a write that changes them
+    also invalidates the cached pages.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            timeout = settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+            if not timeout or request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            key = 'pages:{}:{}'.format(
+                get_version(request, *args, **kwargs),
+                hashlib.md5(request.get_full_path().encode()).hexdigest()
+            )
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            # a response setting cookies belongs to a single visitor
+            if response.status_code == 200 and not response.cookies:
+                if callable(getattr(response, 'render', None)):
+                    response.add_post_render_callback(lambda r: cache.set(key, r, timeout))
+                else:
+                    cache.set(key, response, timeout)
+            return response
+        return wrapped_view
+    return decorator
@@ -0,0 +1,180 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except ValueError:
+        raise InvalidCursor('That cursor is not valid')
+
+
+class KeysetPage:
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates on the position of the last row seen instead of an OFFSET, so
+    deep pages cost the same as the first one.
+
+    `ordering` is a pair of fields like ('-last_updated', '-pk'), the second
+    one unique so every row has a distinct position. The page position
+    travels in an opaque cursor: an empty cursor is the first page and
+    `last_cursor` points at the last one. There is no page number, and
+    `count` is only known when the caller passes it (usually from a stored
+    counter), since counting is what this paginator avoids.
+    """
+
+    last_cursor = encode_cursor({'d': 'prev'})
+
+    def __init__(self, queryset, per_page, ordering, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.count = count
+
+    def get_key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def to_python(self, key):
+        fields = [field.lstrip('-') for field in self.ordering]
+        try:
+            return [self.queryset.model._meta.pk.to_python(value) if name == 'pk'
+                    else self.queryset.model._meta.get_field(name).to_python(value)
+                    for name, value in zip(fields, key)]
+        except Exception:
+            raise InvalidCursor('That cursor is not valid')
+
+    def make_cursor(self, direction, obj):
+        key = [value.isoformat() if hasattr(value, 'isoformat') else value for value in self.get_key(obj)]
+        return encode_cursor({'d': direction, 'k': key})
+
+    def seek(self, queryset, key, backwards):
+        # rows after `key` in the (reversed when going backwards) ordering:
+        # (first >= a) AND NOT (first = a AND second <= b). Unlike the
+        # equivalent OR, the range on `first` can use the index.
+        first, second = self.ordering
+        lookups = []
+        for field in (first, second):
+            descending = field.startswith('-')
+            if descending != backwards:
+                lookups.append((field.lstrip('-') + '__lte', field.lstrip('-') + '__gte'))
+            else:
+                lookups.append((field.lstrip('-') + '__gte', field.lstrip('-') + '__lte'))
+        first_name = first.lstrip('-')
+        return queryset.filter(
+            Q(**{lookups[0][0]: key[0]}) & ~Q(**{first_name: key[0], lookups[1][1]: key[1]})
+        )
+
+    def page(self, cursor):
+        data = decode_cursor(cursor) if cursor else {'d': 'next'}
+        if not isinstance(data, dict) or data.get('d') not in ('next', 'prev'):
+            raise InvalidCursor('That cursor is not valid')
+        backwards = data['d'] == 'prev'
+        key = data.get('k')
+
+        queryset = self.queryset
+        if key is not None:
+            if not isinstance(key, list) or len(key) != 2:
+                raise InvalidCursor('That cursor is not valid')
+            queryset = self.seek(queryset, self.to_python(key), backwards)
+        if backwards:
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in self.ordering]
+        else:
+            ordering = self.ordering
+        # one extra row tells if there is anything beyond this page
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        # `has_more` is about the direction we read in, and coming from a
+        # cursor means there are rows on the other side
+        if backwards:
+            has_next, has_previous = key is not None, has_more
+        else:
+            has_next, has_previous = has_more, key is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.make_cursor('next', rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.make_cursor('prev', rows[0])
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    Adds a keyset pagination mode to a ListView. It is used when the request
+    has a `cursor` parameter, or when PAGINATION_MODE is 'keyset' and the
+    request doesn't ask for a page number (the page links of topics.html and
+    the reply redirect still use them). Otherwise the view keeps Django's
+    page numbers.
+
+    Views set `keyset_ordering` and can return a stored total from
+    `get_total_count` so that neither mode needs a COUNT query.
+    """
+
+    keyset_ordering = None
+    cursor_kwarg = 'cursor'
+
+    def get_total_count(self):
+        return None
+
+    def use_keyset_pagination(self):
+        if self.cursor_kwarg in self.request.GET:
+            return True
+        return settings.PAGINATION_MODE == 'keyset' and self.page_kwarg not in self.request.GET
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        count = self.get_total_count()
+        if count is not None:
+            # Paginator.count is a cached_property, set it to skip the COUNT
+            paginator.count = count
+        return paginator
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering, count=self.get_total_count())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,82 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+# Sends the reads of the list views to the DATABASE_REPLICAS and everything
+# else to the primary ('default').
+#
+# A view reads from a replica only inside read_from_replica(), and not when
+# the request is pinned to the primary: ReplicaStickinessMiddleware (see
+# boards/middleware.py) pins the requests of a client for
+# REPLICA_STICKY_SECONDS after it wrote something, so a reply redirect never
+# shows the topic as it was before the reply.
+
+_state = threading.local()
+
+# Replication lag still shows to the other clients: one may cache a
+# fragment (see boards/fragments.py) read from a replica that is behind, it
+# is served until the next write or FRAGMENT_CACHE_TIMEOUT.
+
+# models read from a replica; sessions and users always come from the
+# primary, a lagging replica would log people out
+REPLICA_APPS = ('boards', 'accounts')
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def start_request(pinned):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+@contextmanager
+def read_from_replica():
+    previous = getattr(_state, 'replica', None)
+    if settings.DATABASE_REPLICAS and not is_pinned():
+        # one replica for the whole request, so the queries of a page agree
+        _state.replica = previous or random.choice(settings.DATABASE_REPLICAS)
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def replica_view(view_func):
+    """
+    Runs the view inside read_from_replica(). A TemplateResponse is rendered
+    there as well, the querysets of the context run while rendering.
+    """
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        with read_from_replica():
+            response = view_func(*args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+            return response
+    return wrapped_view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if replica and model._meta.app_label in REPLICA_APPS:
+            return replica
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'sessions':
+            _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
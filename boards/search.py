@@ -0,0 +1,382 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+
+# Full text search over the topic subjects and post messages.
+#
+# Every post is one document made of its topic's subject and its message,
+# the subject weighing more. The backend follows the database in use:
+# FTS5 on SQLite, a GIN-indexed tsvector column on PostgreSQL, and an
+# in-process inverted index when neither is available. The index is updated
+# by the receivers in boards/signals.py; `manage.py rebuild_search_index`
+# fills it from scratch.
+
+SUBJECT_WEIGHT = 2.0
+MESSAGE_WEIGHT = 1.0
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def weighted_frequencies(subject, message):
+    frequencies = Counter()
+    for term in tokenize(subject):
+        frequencies[term] += SUBJECT_WEIGHT
+    for term in tokenize(message):
+        frequencies[term] += MESSAGE_WEIGHT
+    return frequencies
+
+
+def idf(documents, matches):
+    return math.log(1 + (documents - matches + 0.5) / (matches + 0.5))
+
+
+def bm25(frequency, length, average_length, term_idf):
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+    return term_idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+
+class BaseSearchBackend:
+    def index_post(self, post):
+        raise NotImplementedError
+
+    def index_topic(self, topic):
+        raise NotImplementedError
+
+    # (re)indexes every post of the topics, e.g. after a bulk import
+    def index_topics(self, topic_pks):
+        raise NotImplementedError
+
+    def remove_post(self, post_pk):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    # returns the pks of the matching posts, best match first
+    def search(self, query, board_pk=None, limit=50):
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Uses the boards_post_fts FTS5 table created by migration 0008. The rowid
+    of each row is the post pk.
+
+    Only the `candidates` newest matches are ranked, read backwards from the
+    index, and the board is a term of the MATCH (migration 0013). They are
+    ranked here with BM25, like SimpleSearchBackend: FTS5's bm25() reads the
+    whole posting list of every term for its IDF on each query, which is
+    most of the index for a common word. The number of posts matching a
+    term is cached for `idf_timeout` seconds instead.
+    """
+
+    table = 'boards_post_fts'
+    candidates = 500
+    idf_timeout = 3600
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM boards_post_fts WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                'INSERT INTO boards_post_fts (rowid, subject, message, board_id) VALUES (%s, %s, %s, %s)',
+                [post.pk, post.topic.subject, post.message, post.topic.board_id]
+            )
+
+    def index_topic(self, topic):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE boards_post_fts SET subject = %s '
+                'WHERE rowid IN (SELECT id FROM boards_post WHERE topic_id = %s)',
+                [topic.subject, topic.pk]
+            )
+
+    def index_topics(self, topic_pks):
+        placeholders = ', '.join(['%s'] * len(topic_pks))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM boards_post_fts '
+                'WHERE rowid IN (SELECT id FROM boards_post WHERE topic_id IN ({}))'.format(placeholders),
+                topic_pks
+            )
+            cursor.execute(
+                'INSERT INTO boards_post_fts (rowid, subject, message, board_id) '
+                'SELECT p.id, t.subject, p.message, t.board_id '
+                'FROM boards_post p INNER JOIN boards_topic t ON t.id = p.topic_id '
+                'WHERE t.id IN ({})'.format(placeholders),
+                topic_pks
+            )
+
+    def remove_post(self, post_pk):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM boards_post_fts WHERE rowid = %s', [post_pk])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM boards_post_fts')
+            cursor.execute(
+                'INSERT INTO boards_post_fts (rowid, subject, message, board_id) '
+                'SELECT p.id, t.subject, p.message, t.board_id '
+                'FROM boards_post p INNER JOIN boards_topic t ON t.id = p.topic_id'
+            )
+
+    def search(self, query, board_pk=None, limit=50):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        terms = set(terms)
+        match = self.match(terms)
+        if board_pk is not None:
+            match += ' AND board_id : "{}"'.format(int(board_pk))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid, subject, message FROM boards_post_fts WHERE boards_post_fts MATCH %s '
+                'ORDER BY rowid DESC LIMIT %s',
+                [match, self.candidates]
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return []
+
+        documents = {pk: weighted_frequencies(subject, message) for pk, subject, message in rows}
+        lengths = {pk: sum(frequencies.values()) for pk, frequencies in documents.items()}
+        # of the candidates, the whole index would take reading every post
+        average_length = sum(lengths.values()) / len(lengths) or 1
+        total = self.count_documents()
+        idfs = {term: idf(total, self.count_matches(term)) for term in terms}
+        scores = {
+            pk: sum(bm25(frequencies[term], lengths[pk], average_length, idfs[term]) for term in terms)
+            for pk, frequencies in documents.items()
+        }
+        return sorted(scores, key=lambda pk: (-scores[pk], pk))[:limit]
+
+    @staticmethod
+    def match(terms):
+        # quote every term so the user can't write FTS5 syntax; the terms are
+        # ANDed, and not looked for in board_id
+        return '{{subject message}} : ({})'.format(' '.join('"{}"'.format(term) for term in terms))
+
+    def count_documents(self):
+        from .models import Board
+
+        return Board.objects.aggregate(total=Sum('posts_count'))['total'] or 0
+
+    def count_matches(self, term):
+        def count():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT count(*) FROM boards_post_fts WHERE boards_post_fts MATCH %s', [self.match([term])]
+                )
+                return cursor.fetchone()[0]
+
+        key = 'search:matches:{}'.format(hashlib.md5(term.encode()).hexdigest())
+        return cache.get_or_set(key, count, self.idf_timeout)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Uses the boards_post.search_vector tsvector column and its GIN index,
+    created by migration 0008 on PostgreSQL only. The column isn't part of
+    the Post model, it is written with raw SQL. The ranking is ts_rank_cd,
+    PostgreSQL has no BM25.
+    """
+
+    config = 'english'
+    vector = (
+        "setweight(to_tsvector('{config}', t.subject), 'A') || "
+        "setweight(to_tsvector('{config}', p.message), 'B')"
+    ).format(config=config)
+
+    def index_post(self, post):
+        self.update_vectors('p.id = %s', [post.pk])
+
+    def index_topic(self, topic):
+        self.update_vectors('p.topic_id = %s', [topic.pk])
+
+    def index_topics(self, topic_pks):
+        self.update_vectors('p.topic_id IN %s', [tuple(topic_pks)])
+
+    def remove_post(self, post_pk):
+        # the vector is deleted with the row
+        pass
+
+    def rebuild(self):
+        self.update_vectors('TRUE', [])
+
+    def update_vectors(self, where, params):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE boards_post p SET search_vector = {vector} FROM boards_topic t '
+                'WHERE t.id = p.topic_id AND {where}'.format(vector=self.vector, where=where),
+                params
+            )
+
+    def search(self, query, board_pk=None, limit=50):
+        if not tokenize(query):
+            return []
+        sql = (
+            "SELECT p.id FROM boards_post p, plainto_tsquery('{config}', %s) q "
+            "WHERE p.search_vector @@ q"
+        ).format(config=self.config)
+        params = [query]
+        if board_pk is not None:
+            sql += ' AND p.topic_id IN (SELECT id FROM boards_topic WHERE board_id = %s)'
+            params.append(board_pk)
+        sql += ' ORDER BY ts_rank_cd(p.search_vector, q) DESC LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    In-process inverted index ranked with BM25. It is loaded from the
+    database on the first search and then kept up to date by the signals of
+    this process only, so it is meant for development and tests, or for a
+    single process deployment.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.clear()
+
+    def clear(self):
+        self.postings = defaultdict(dict)  # term -> {post pk: weighted term frequency}
+        self.lengths = {}  # post pk -> weighted document length
+        self.terms = {}  # post pk -> terms of the post, to remove it again
+        self.boards = {}  # post pk -> board pk
+
+    def add(self, post_pk, board_pk, subject, message):
+        frequencies = weighted_frequencies(subject, message)
+        with self.lock:
+            self.discard(post_pk)
+            for term, frequency in frequencies.items():
+                self.postings[term][post_pk] = frequency
+            self.lengths[post_pk] = sum(frequencies.values())
+            self.terms[post_pk] = list(frequencies)
+            self.boards[post_pk] = board_pk
+
+    def discard(self, post_pk):
+        for term in self.terms.pop(post_pk, ()):
+            self.postings[term].pop(post_pk, None)
+            if not self.postings[term]:
+                del self.postings[term]
+        self.lengths.pop(post_pk, None)
+        self.boards.pop(post_pk, None)
+
+    def load(self):
+        from .models import Post
+
+        with self.lock:
+            if self.loaded:
+                return
+            posts = Post.objects.values_list('pk', 'topic__board_id', 'topic__subject', 'message')
+            for post in posts.iterator(chunk_size=2000):
+                self.add(*post)
+            self.loaded = True
+
+    def index_post(self, post):
+        if self.loaded:
+            self.add(post.pk, post.topic.board_id, post.topic.subject, post.message)
+
+    def index_topic(self, topic):
+        if not self.loaded:
+            return
+        from .models import Post
+
+        for post in Post.objects.filter(topic=topic).values_list('pk', 'message'):
+            self.add(post[0], topic.board_id, topic.subject, post[1])
+
+    def index_topics(self, topic_pks):
+        if not self.loaded:
+            return
+        from .models import Post
+
+        posts = Post.objects.filter(topic__in=topic_pks).values_list('pk', 'topic__board_id', 'topic__subject', 'message')
+        for post in posts.iterator(chunk_size=2000):
+            self.add(*post)
+
+    def remove_post(self, post_pk):
+        with self.lock:
+            self.discard(post_pk)
+
+    def rebuild(self):
+        with self.lock:
+            self.clear()
+            self.loaded = False
+            self.load()
+
+    def search(self, query, board_pk=None, limit=50):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        self.load()
+        with self.lock:
+            documents = len(self.lengths)
+            if not documents:
+                return []
+            average_length = sum(self.lengths.values()) / documents
+            postings = [self.postings.get(term, {}) for term in terms]
+            # every term must match, start from the rarest one
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting.keys()
+            if board_pk is not None:
+                candidates = {pk for pk in candidates if self.boards[pk] == board_pk}
+
+            scores = {}
+            for posting in postings:
+                term_idf = idf(documents, len(posting))
+                for pk in candidates:
+                    scores[pk] = scores.get(pk, 0) + bm25(posting[pk], self.lengths[pk], average_length, term_idf)
+        return sorted(scores, key=lambda pk: (-scores[pk], pk))[:limit]
+
+
+backends = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+    'simple': SimpleSearchBackend,
+}
+_backend = None
+
+
+def get_backend():
+    """
+    Returns the backend named by SEARCH_BACKEND, or for 'auto' the one that
+    matches the database, when its index exists.
+    """
+    global _backend
+    if _backend is None:
+        name = settings.SEARCH_BACKEND
+        if name == 'auto':
+            name = connection.vendor
+            if name == 'sqlite' and SQLiteSearchBackend.table not in connection.introspection.table_names():
+                # SQLite was built without FTS5, see migration 0008
+                name = 'simple'
+            if name not in backends:
+                name = 'simple'
+        _backend = backends[name]()
+    return _backend
+
+
+def search_posts(query, board=None, limit=50):
+    """Returns the matching posts, best match first, with their topic and author."""
+    from .models import Post
+
+    pks = get_backend().search(query, board_pk=board.pk if board else None, limit=limit)
+    posts = Post.objects.select_related('topic__board', 'created_by').in_bulk(pks)
+    return [posts[pk] for pk in pks if pk in posts]
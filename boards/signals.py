@@ -0,0 +1,158 @@
+import logging
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Profile
+
+from . import fragments
+from .models import Board, Post, Topic
+from .search import get_backend as get_search_backend
+from .viewcount import topic_views
+
+logger = logging.getLogger(__name__)
+
+
+# Keep the denormalized Board, Topic and Profile counters in step with the rows
+# written by new_topic, reply_topic and the admin. The updates use F() expressions so
+# concurrent writers can't overwrite each other's increments.
+@receiver(post_save, sender=Topic)
+def topic_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Board.objects.filter(pk=instance.board_id).update(topics_count=F('topics_count') + 1)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # also refreshes instance.topic.posts_count, see reply_topic
+        instance.topic.record_post(instance)
+        Board.objects.filter(pk=instance.topic.board_id).update(
+            posts_count=F('posts_count') + 1,
+            last_post=instance
+        )
+        Profile.objects.filter(user=instance.created_by_id).update(posts_count=F('posts_count') + 1)
+
+
+@receiver(post_save, sender=Post)
+def post_edited(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        Topic.objects.filter(pk=instance.topic_id).update(last_edited=timezone.now())
+
+
+# post_delete runs once per row, also for the posts removed when a topic is
+# deleted. The topic and board rows are still there at that point because the
+# deletion collector removes children first.
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    topics = Topic.objects.filter(pk=instance.topic_id, posts_count__gt=0)
+    topics.update(posts_count=F('posts_count') - 1, last_edited=timezone.now())
+    # a topic that lost its last post (SET_NULL) gets the one before
+    for topic in Topic.objects.filter(pk=instance.topic_id, last_post__isnull=True):
+        last_post = topic.posts.order_by('-created_at', '-pk').first()
+        if last_post is not None:
+            Topic.objects.filter(pk=topic.pk).update(last_post=last_post)
+    profiles = Profile.objects.filter(user=instance.created_by_id, posts_count__gt=0)
+    profiles.update(posts_count=F('posts_count') - 1)
+    boards = Board.objects.filter(topics__pk=instance.topic_id)
+    boards.filter(posts_count__gt=0).update(posts_count=F('posts_count') - 1)
+    # Board.last_post is SET_NULL, so a board that lost its last post needs a new one
+    for board in boards.filter(last_post__isnull=True):
+        board.last_post = board.get_last_post()
+        if board.last_post is not None:
+            Board.objects.filter(pk=board.pk).update(last_post=board.last_post)
+
+
+@receiver(post_delete, sender=Topic)
+def topic_deleted(sender, instance, **kwargs):
+    boards = Board.objects.filter(pk=instance.board_id, topics_count__gt=0)
+    boards.update(topics_count=F('topics_count') - 1)
+
+
+# keep the full text search index in step, see boards/search.py
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index_post(instance)
+
+
+@receiver(post_save, sender=Topic)
+def index_topic(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # a new topic has no posts yet, and only a new subject changes the index
+    if created or raw or (update_fields is not None and 'subject' not in update_fields):
+        return
+    get_search_backend().index_topic(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_search_backend().remove_post(instance.pk)
+
+
+# Replace the fragment cache versions of what a write changed, see
+# boards/fragments.py. Editing a post only changes its topic page; new and
+# deleted rows also change the board's topic list and the home page. The
+# versions are replaced once the transaction commits: before, a reader
+# would cache the old rows under the new version.
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def bump_board_fragments(sender, instance, **kwargs):
+    board_pk = instance.pk
+
+    def bump():
+        fragments.bump('board', board_pk)
+        fragments.bump('home')
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def bump_topic_fragments(sender, instance, **kwargs):
+    topic_pk, board_pk = instance.pk, instance.board_id
+
+    def bump():
+        fragments.bump('topic', topic_pk)
+        fragments.bump('board', board_pk)
+        fragments.bump('home')
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_fragments(sender, instance, created=True, **kwargs):
+    topic_pk = instance.topic_id
+    # read now, the topic may be deleted with the post
+    board_pk = instance.topic.board_id if created else None
+
+    def bump():
+        fragments.bump('topic', topic_pk)
+        if created:
+            fragments.bump('board', board_pk)
+            fragments.bump('home')
+    transaction.on_commit(bump)
+
+
+# runs after the response went out, so readers never wait for the view counter
+@receiver(request_finished)
+def flush_topic_views(sender, **kwargs):
+    if topic_views.should_flush():
+        try:
+            topic_views.flush()
+        except Exception:
+            logger.exception('Could not flush the buffered topic views')
+
+
+# the SQLite deployment profile, see SQLITE_PRAGMAS in webBoard/settings.py
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
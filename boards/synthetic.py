@@ -0,0 +1,211 @@
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.avatars import gravatar_hash
+from accounts.models import Profile
+
+from . import fragments
+from .bulk import insert_rows, next_pk
+from .models import MARKDOWN_VERSION, Board, Post, Topic, render_markdown, update_author_counters
+from .search import get_backend as get_search_backend
+
+# Generates boards, users, topics and posts with bulk_create and insert_rows
+# (see boards/bulk.py), to reproduce production volumes locally
+# (benchmarks, query plans...).
+
+TOPIC_FIELDS = ('id', 'subject', 'board_id', 'starter_id', 'last_updated', 'views', 'posts_count', 'last_post_id')
+POST_FIELDS = ('id', 'topic_id', 'created_by_id', 'created_at', 'message', 'message_html', 'message_html_version')
+
+WORDS = (
+    'django python query index cache topic board post reply page view template model migration '
+    'server worker request response database table row column cursor session user avatar search '
+    'markdown render count counter latency throughput profile benchmark replica primary lock'
+).split()
+
+
+def skewed_split(rng, total, parts, skew):
+    """
+    Splits `total` into `parts` counts following a Pareto distribution: a
+    few parts get most of it, like a few topics get most of the replies.
+    A lower `skew` is more unequal.
+    """
+    if parts <= 0:
+        return []
+    weights = [rng.paretovariate(skew) for _ in range(parts)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for i in rng.sample(range(parts), min(parts, total - sum(counts))):
+        counts[i] += 1
+    return counts
+
+
+class ForumGenerator:
+    """
+    Writes `boards` boards, `users` users, `topics` topics and `posts` posts
+    (the first post of each topic included) for a given `seed`. Topics spread
+    over the boards, replies over the topics and posts over their authors
+    with Pareto distributions of shape `board_skew`, `topic_skew` and
+    `author_skew`.
+
+    Rows get explicit primary keys so the relations, the denormalized
+    counters and the last post pointers are computed up front instead of
+    being read back. Every post date falls in the `days` before `until`, and
+    Topic.last_updated is the date of its last post. With the same seed and
+    `until` the generated data is the same.
+    """
+
+    def __init__(self, boards=10, users=100, topics=1000, posts=20000, seed=0, board_skew=1.2, topic_skew=1.2,
+                 author_skew=1.2, days=365, until=None, batch_size=2000, messages=500, log=None):
+        self.boards = boards
+        self.users = users
+        # every board gets a topic, and every topic its first post
+        self.topics = max(topics, boards)
+        self.posts = max(posts, self.topics)
+        self.seed = seed
+        self.board_skew = board_skew
+        self.topic_skew = topic_skew
+        self.author_skew = author_skew
+        self.days = days
+        self.until = until or timezone.now()
+        self.batch_size = batch_size
+        self.messages = messages
+        self.log = log or (lambda message: None)
+
+    def rng(self, *key):
+        # a generator per part of the data, so each part doesn't depend on how
+        # many random numbers the others used
+        return random.Random('{}:{}'.format(self.seed, ':'.join(map(str, key))))
+
+    def make_messages(self):
+        # a pool of messages rendered once, rendering every post would be the slowest part
+        rng = self.rng('messages')
+        pool = []
+        for i in range(self.messages):
+            paragraphs = ['{}.'.format(' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))).capitalize())
+                          for _ in range(rng.randint(1, 4))]
+            if i % 5 == 0:
+                paragraphs.append('**{}** `{}`'.format(rng.choice(WORDS), rng.choice(WORDS)))
+            message = '\n\n'.join(paragraphs)
+            pool.append((message, render_markdown(message)))
+        return pool
+
+    def bulk_create(self, model, objs):
+        for start in range(0, len(objs), self.batch_size):
+            model.objects.bulk_create(objs[start:start + self.batch_size])
+
+    def generate(self):
+        self.create_users()
+        self.create_boards()
+        self.create_topics_and_posts()
+        if connection.vendor == 'postgresql':
+            # the explicit pks left the sequences behind
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [User, Board, Topic, Post]):
+                    cursor.execute(sql)
+        get_search_backend().rebuild()
+        fragments.bump('home')
+        fragments.bump('board', *self.board_pks)
+
+    def create_users(self):
+        first_pk = next_pk(User)
+        password = make_password('benchmark')
+        users = [
+            User(pk=first_pk + i, username='user{}-{}'.format(self.seed, first_pk + i),
+                 email='user{}@example.com'.format(first_pk + i), password=password)
+            for i in range(self.users)
+        ]
+        with transaction.atomic():
+            self.bulk_create(User, users)
+            # bulk_create doesn't send post_save, see accounts/signals.py
+            self.bulk_create(Profile, [Profile(user=user, gravatar_hash=gravatar_hash(user.email)) for user in users])
+        self.user_pks = [user.pk for user in users]
+        # a few users write most of the posts
+        rng = self.rng('authors')
+        weights = [rng.paretovariate(self.author_skew) for _ in self.user_pks]
+        self.author_weights = list(itertools.accumulate(weights))
+        self.log('{} users'.format(len(users)))
+
+    def create_boards(self):
+        first_pk = next_pk(Board)
+        boards = [
+            Board(pk=first_pk + i, name='Board {}'.format(first_pk + i),
+                  description='Generated board {} (seed {})'.format(first_pk + i, self.seed))
+            for i in range(self.boards)
+        ]
+        with transaction.atomic():
+            self.bulk_create(Board, boards)
+        self.board_pks = [board.pk for board in boards]
+        self.log('{} boards'.format(len(boards)))
+
+    def create_topics_and_posts(self):
+        rng = self.rng('topics')
+        messages = self.make_messages()
+        topic_pk = next_pk(Topic)
+        post_pk = next_pk(Post)
+        window = timedelta(days=self.days).total_seconds()
+
+        topics_per_board = skewed_split(rng, self.topics - self.boards, self.boards, self.board_skew)
+        topics_per_board = [count + 1 for count in topics_per_board]
+        topics_per_board[-1] -= sum(topics_per_board) - self.topics
+        posts_per_topic = skewed_split(rng, self.posts - self.topics, self.topics, self.topic_skew)
+
+        board_posts = dict.fromkeys(self.board_pks, 0)
+        board_last_posts = {}
+        topics = []
+        posts = []
+        written_posts = 0
+        topic_counts = iter(posts_per_topic)
+        for board_pk, board_topics in zip(self.board_pks, topics_per_board):
+            for _ in range(board_topics):
+                topic_rng = self.rng('topic', topic_pk)
+                count = next(topic_counts) + 1
+                # the first post starts the topic, the last one is the last update
+                start = self.until - timedelta(seconds=topic_rng.uniform(0, window))
+                end = start + (self.until - start) * topic_rng.random() ** 3
+                dates = sorted(topic_rng.uniform(0, (end - start).total_seconds()) for _ in range(count - 2))
+                dates = [start] + [start + timedelta(seconds=seconds) for seconds in dates] + [end][:count - 1]
+                authors = topic_rng.choices(self.user_pks, cum_weights=self.author_weights, k=count)
+
+                topics.append((
+                    topic_pk, ' '.join(topic_rng.choice(WORDS) for _ in range(6)).capitalize(), board_pk,
+                    authors[0], dates[-1], topic_rng.randint(count, count * 20), count, post_pk + count - 1
+                ))
+                for date, author in zip(dates, authors):
+                    message, message_html = topic_rng.choice(messages)
+                    posts.append((post_pk, topic_pk, author, date, message, message_html, MARKDOWN_VERSION))
+                    post_pk += 1
+                board_posts[board_pk] += count
+                last = board_last_posts.get(board_pk)
+                if last is None or dates[-1] > last[0]:
+                    board_last_posts[board_pk] = (dates[-1], post_pk - 1)
+                topic_pk += 1
+
+                if len(posts) >= self.batch_size * 10:
+                    written_posts += self.write(topics, posts)
+                    topics, posts = [], []
+                    self.log('{} posts'.format(written_posts))
+        written_posts += self.write(topics, posts)
+        self.log('{} posts'.format(written_posts))
+        update_author_counters(self.user_pks)
+
+        with transaction.atomic():
+            for board_pk, board_topics in zip(self.board_pks, topics_per_board):
+                Board.objects.filter(pk=board_pk).update(
+                    topics_count=board_topics,
+                    posts_count=board_posts[board_pk],
+                    last_post_id=board_last_posts[board_pk][1]
+                )
+
+    def write(self, topics, posts):
+        # rows with their dates, see insert_rows
+        with transaction.atomic():
+            insert_rows(Topic, TOPIC_FIELDS, topics)
+            insert_rows(Post, POST_FIELDS, posts)
+        return len(posts)
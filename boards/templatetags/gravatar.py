@@ -1,19 +1,17 @@
-import hashlib
-from urllib.parse import urlencode
-
 from django import template
-from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+
+from accounts.avatars import gravatar_hash, gravatar_url
 
 register = template.Library()
 
 
+# `size` is the displayed width in pixels. Select the profile with the user
+# (select_related('created_by__profile')) to avoid a query per avatar.
 @register.filter
-def gravatar(user):
-    email = user.email.lower().encode('utf-8')
-    default = 'mm'
-    size = 256
-    url = 'https://www.gravatar.com/avatar/{md5}?{params}'.format(
-        md5=hashlib.md5(email).hexdigest(),
-        params=urlencode({'d': default, 's': str(size)})
-    )
-    return url
\ No newline at end of file
+def gravatar(user, size=80):
+    try:
+        return user.profile.get_avatar_url(size)
+    except ObjectDoesNotExist:
+        # users created before their profile, e.g. by bulk_create
+        return gravatar_url(gravatar_hash(user.email), size)
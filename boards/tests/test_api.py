@@ -0,0 +1,91 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Board, Post, Topic
+from ..viewcount import topic_views
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        self.post = Post.objects.create(message='**Hello**', topic=self.topic, created_by=self.user)
+
+    def get_json(self, url, data=None):
+        response = self.client.get(url, data)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content).decode())
+
+
+class BoardsAPITests(APITestCase):
+    def test_boards(self):
+        data = self.get_json(reverse('api_boards'))
+        self.assertEquals(data['results'], [{
+            'id': self.board.pk, 'name': 'Django', 'description': 'Django board.', 'topics_count': 1,
+            'posts_count': 1, 'last_post': self.post.pk, 'last_post_by': 'john',
+            'last_post_at': json.loads(DjangoJSONEncoder().encode(self.post.created_at)),
+        }])
+
+    def test_fields(self):
+        data = self.get_json(reverse('api_boards'), {'fields': 'id,name'})
+        self.assertEquals(data['results'], [{'id': self.board.pk, 'name': 'Django'}])
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api_boards'), {'fields': 'id,password'})
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json(), {'error': 'Unknown fields: password'})
+
+
+class TopicsAPITests(APITestCase):
+    def test_cursor_pagination(self):
+        for i in range(4):
+            Topic.objects.create(subject='Topic {}'.format(i), board=self.board, starter=self.user)
+        url = reverse('api_board_topics', kwargs={'pk': self.board.pk})
+        first = self.get_json(url, {'limit': 3, 'fields': 'subject'})
+        self.assertEquals(len(first['results']), 3)
+        self.assertIsNone(first['previous'])
+        second = self.get_json(url, {'limit': 3, 'fields': 'subject', 'cursor': first['next']})
+        self.assertEquals(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        subjects = [topic['subject'] for topic in first['results'] + second['results']]
+        self.assertEquals(sorted(subjects), sorted(Topic.objects.values_list('subject', flat=True)))
+
+
+class PostsAPITests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api_topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+
+    def test_posts(self):
+        data = self.get_json(self.url, {'fields': 'id,message_html,created_by,author_posts_count'})
+        self.assertEquals(data['results'], [{
+            'id': self.post.pk, 'message_html': '<p><strong>Hello</strong></p>', 'created_by': 'john',
+            'author_posts_count': 1,
+        }])
+        self.assertEquals(data['count'], 1)
+
+    def test_no_query_per_post(self):
+        with self.assertNumQueries(3):
+            self.get_json(self.url)
+        for i in range(5):
+            user = User.objects.create_user(username='user{}'.format(i))
+            Post.objects.create(message='Post {}'.format(i), topic=self.topic, created_by=user)
+        with self.assertNumQueries(3):
+            self.get_json(self.url)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 304)
+
+    def test_reads_are_not_views(self):
+        topic_views.reset()
+        response = self.client.get(self.url)
+        self.assertEquals(topic_views.get_pending(self.topic.pk), 0)
+        self.assertNotIn('viewed_topics', response.cookies)
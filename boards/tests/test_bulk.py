@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..bulk import allocate_pks, import_topics, insert_transaction
+from ..models import Board, Post, Topic
+from ..search import search_posts
+
+
+def date(day):
+    return datetime(2018, 5, day, tzinfo=timezone.utc)
+
+
+class ImportTopicsTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.john = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.jane = User.objects.create_user(username='jane', email='jane@doe.com', password='123')
+        topic = Topic.objects.create(subject='Existing topic', board=self.board, starter=self.john)
+        self.existing_post = Post.objects.create(message='Existing post', topic=topic, created_by=self.john)
+
+        self.topics = [
+            {'subject': 'Imported topic {}'.format(i), 'views': 3, 'posts': [
+                {'message': '**first** {}'.format(i), 'created_by': self.jane, 'created_at': date(1)},
+                {'message': 'reply {}'.format(i), 'created_by': self.john, 'created_at': date(2 + i)},
+            ]}
+            for i in range(5)
+        ]
+
+    def test_import(self):
+        self.assertEquals(import_topics(self.board, self.topics, batch_size=2), (5, 10))
+        topic = Topic.objects.get(subject='Imported topic 4')
+        self.assertEquals(topic.starter, self.jane)
+        self.assertEquals(topic.posts_count, 2)
+        self.assertEquals(topic.last_updated, date(6))
+        self.assertEquals(topic.views, 3)
+        first = topic.posts.order_by('created_at').first()
+        self.assertEquals(first.created_at, date(1))
+        self.assertEquals(first.message_html, '<p><strong>first</strong> 4</p>')
+
+    def test_board_counters(self):
+        import_topics(self.board, self.topics, batch_size=2)
+        self.board.refresh_from_db()
+        self.assertEquals(self.board.topics_count, 6)
+        self.assertEquals(self.board.posts_count, 11)
+        # the imported posts are older than the existing one
+        self.assertEquals(self.board.last_post, self.existing_post)
+
+    def test_author_counters(self):
+        import_topics(self.board, self.topics, batch_size=2)
+        self.assertEquals(User.objects.get(username='john').profile.posts_count, 6)
+        self.assertEquals(User.objects.get(username='jane').profile.posts_count, 5)
+
+    def test_search_index(self):
+        import_topics(self.board, self.topics)
+        self.assertEquals([post.message for post in search_posts('reply 3')], ['reply 3'])
+
+    def test_large_batch(self):
+        # more variables than the 999 of SQLite before 3.32 in one UPDATE
+        post = {'message': 'Hi', 'created_by': self.john, 'created_at': date(1)}
+        topics = [{'subject': 'Topic {}'.format(i), 'posts': [post]} for i in range(400)]
+        self.assertEquals(import_topics(self.board, topics, batch_size=400), (400, 400))
+        self.assertFalse(Topic.objects.filter(last_post__isnull=True).exists())
+
+    def test_topic_without_posts(self):
+        with self.assertRaises(ValueError):
+            import_topics(self.board, [{'subject': 'Empty', 'posts': []}])
+        self.assertEquals(Topic.objects.count(), 1)
+
+
+class AllocatePksTests(TestCase):
+    def test_after_the_largest_pk(self):
+        board = Board.objects.create(name='Django', description='Django board.')
+        with insert_transaction():
+            self.assertEquals(allocate_pks(Board, 3), [board.pk + 1, board.pk + 2, board.pk + 3])
+
+    def test_write_lock_comes_first(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with CaptureQueriesContext(connection) as context:
+            with insert_transaction():
+                allocate_pks(Board, 1)
+        statements = [query['sql'] for query in context if not query['sql'].startswith('SAVEPOINT')]
+        self.assertTrue(statements[0].startswith('UPDATE'))
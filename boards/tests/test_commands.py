@@ -0,0 +1,132 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import LiveServerTestCase, TestCase
+
+from accounts.models import Profile
+
+from ..models import MARKDOWN_VERSION, Board, Post, Topic, render_markdown
+from ..viewcount import topic_views
+
+
+class RebuildBoardCountersTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=user)
+        self.post = Post.objects.create(message='Lorem ipsum dolor sit amet', topic=topic, created_by=user)
+
+    def test_rebuilds_counters(self):
+        # simulate counters that drifted, e.g. after a raw SQL import
+        Board.objects.update(posts_count=7, topics_count=0, last_post=None)
+        Topic.objects.update(posts_count=0)
+        Profile.objects.update(posts_count=3)
+        out = StringIO()
+        call_command('rebuild_board_counters', stdout=out)
+        self.board.refresh_from_db()
+        self.assertEquals(Topic.objects.get().posts_count, 1)
+        self.assertEquals(self.board.posts_count, 1)
+        self.assertEquals(self.board.topics_count, 1)
+        self.assertEquals(self.board.last_post, self.post)
+        self.assertEquals(Profile.objects.get().posts_count, 1)
+        self.assertIn('1 board(s)', out.getvalue())
+
+
+class RenderPostsTests(TestCase):
+    def setUp(self):
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        for i in range(3):
+            Post.objects.create(message='**post {}**'.format(i), topic=topic, created_by=user)
+
+    def test_post_is_rendered_on_save(self):
+        post = Post.objects.first()
+        self.assertEquals(post.message_html, '<p><strong>post 0</strong></p>')
+        self.assertEquals(post.message_html_version, MARKDOWN_VERSION)
+
+    def test_renders_outdated_posts(self):
+        # posts saved before the HTML was stored, or with an older renderer
+        Post.objects.update(message_html='', message_html_version=0)
+        call_command('render_posts', batch_size=2, stdout=StringIO())
+        for post in Post.objects.all():
+            self.assertEquals(post.message_html_version, MARKDOWN_VERSION)
+            self.assertEquals(post.message_html, render_markdown(post.message))
+
+    def test_post_edited_while_rendering(self):
+        Post.objects.update(message_html='', message_html_version=0)
+        edited = Post.objects.first()
+
+        def render_and_edit(message):
+            # the author saves a new message after the batch was read
+            if message == edited.message:
+                post = Post.objects.get(pk=edited.pk)
+                post.message = '**edited**'
+                post.save()
+            return render_markdown(message)
+
+        with mock.patch('boards.management.commands.render_posts.render_markdown', render_and_edit):
+            call_command('render_posts', stdout=StringIO())
+        edited.refresh_from_db()
+        self.assertEquals(edited.message_html, '<p><strong>edited</strong></p>')
+
+
+class BenchmarkViewsTests(TestCase):
+    def tearDown(self):
+        topic_views.reset()
+
+    def test_populates_and_measures(self):
+        out = StringIO()
+        call_command('benchmark_views', populate=True, boards=3, users=5, topics=12, posts=80,
+                     requests=2, stdout=out)
+        for scenario in ('home', 'board_topics', 'topic_posts', 'reply_topic', 'new_topic'):
+            self.assertIn(scenario, out.getvalue())
+        self.assertEquals(Board.objects.count(), 3)
+
+    def test_regression_against_baseline(self):
+        from ..benchmark import compare
+        baseline = {'home': {'p90': 10.0, 'queries': 3}}
+        self.assertEquals(compare({'home': {'p90': 11.0, 'queries': 3}}, baseline), [])
+        self.assertEquals(len(compare({'home': {'p90': 13.0, 'queries': 4}}, baseline)), 2)
+
+
+class BenchmarkSlowClientsTests(LiveServerTestCase):
+    def tearDown(self):
+        topic_views.reset()
+
+    def test_measures_throughput(self):
+        call_command('generate_forum_data', boards=2, users=3, topics=4, posts=10, stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_slow_clients', url=self.live_server_url, clients=2, slow_clients=1,
+                     duration=1, delay=0.2, stdout=out)
+        self.assertIn('requests/s', out.getvalue())
+
+
+class GenerateForumDataTests(TestCase):
+    def generate(self, seed):
+        call_command('generate_forum_data', boards=3, users=4, topics=10, posts=60, seed=seed,
+                     until='2019-01-31', stdout=StringIO())
+        return list(Post.objects.order_by('pk').values_list('topic__subject', 'created_by__username', 'created_at'))
+
+    def test_counters_are_consistent(self):
+        self.generate(seed=1)
+        self.assertEquals(Post.objects.count(), 60)
+        for topic in Topic.objects.all():
+            posts = topic.posts.order_by('created_at', 'pk')
+            self.assertEquals(topic.posts_count, posts.count())
+            self.assertEquals(topic.last_updated, posts.last().created_at)
+            self.assertEquals(topic.starter_id, posts.first().created_by_id)
+        for board in Board.objects.all():
+            posts = Post.objects.filter(topic__board=board)
+            self.assertEquals(board.topics_count, board.topics.count())
+            self.assertEquals(board.posts_count, posts.count())
+            self.assertEquals(board.last_post, posts.order_by('-created_at').first())
+
+    def test_same_seed_same_data(self):
+        first = self.generate(seed=1)
+        for model in (Post, Topic, Board):
+            model.objects.all().delete()
+        User.objects.all().delete()
+        self.assertEquals(self.generate(seed=1), first)
@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..events import Channel, bus
+from ..models import Board, Post, Topic
+
+
+class ChannelTests(TestCase):
+    def test_wait_returns_new_events(self):
+        channel = Channel()
+        channel.publish(1, 'one')
+        events, position = channel.wait(0, timeout=0)
+        self.assertEquals(events, [(1, 'one')])
+        channel.publish(2, 'two')
+        self.assertEquals(channel.wait(position, timeout=0), ([(2, 'two')], 2))
+
+    def test_wait_times_out(self):
+        self.assertEquals(Channel().wait(0, timeout=0.01), ([], 0))
+
+
+@override_settings(TOPIC_EVENTS_STREAM_SECONDS=0.1, TOPIC_EVENTS_KEEPALIVE_SECONDS=0.05)
+class TopicEventsTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        self.first_post = Post.objects.create(message='First', topic=self.topic, created_by=self.user)
+        self.url = reverse('topic_events', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+
+    def read(self, response):
+        return ''.join(chunk.decode() for chunk in response.streaming_content)
+
+    def test_event_stream(self):
+        response = self.client.get(self.url)
+        self.assertEquals(response['Content-Type'], 'text/event-stream')
+        content = self.read(response)
+        self.assertIn('retry: ', content)
+        self.assertIn(': keepalive', content)
+        self.assertFalse(bus.has_listeners(self.topic.pk))
+
+    def test_catches_up_from_last_event_id(self):
+        post = Post.objects.create(message='**Missed**', topic=self.topic, created_by=self.user)
+        content = self.read(self.client.get(self.url, HTTP_LAST_EVENT_ID=str(self.first_post.pk)))
+        self.assertIn('id: {}\nevent: post\n'.format(post.pk), content)
+        self.assertIn('<strong>Missed</strong>', content)
+        self.assertNotIn('id: {}\n'.format(self.first_post.pk), content)
+
+    def test_reply_is_pushed(self):
+        response = self.client.get(self.url)
+        stream = response.streaming_content
+        # the first chunk comes once the stream listens
+        self.assertIn(b'retry: ', next(stream))
+        self.client.login(username='john', password='123')
+        self.client.post(reverse('reply_topic', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk}),
+                         {'message': 'A _live_ reply'})
+        reply = Post.objects.latest('pk')
+        event = next(stream).decode()
+        self.assertTrue(event.startswith('id: {}\nevent: post\n'.format(reply.pk)))
+        self.assertIn('<em>live</em>', event)
+        response.close()
+        self.assertFalse(bus.has_listeners(self.topic.pk))
+
+    @override_settings(TOPIC_EVENTS_MAX_LISTENERS=0, TOPIC_EVENTS_POLL_SECONDS=30)
+    def test_too_many_listeners_poll(self):
+        content = self.read(self.client.get(self.url))
+        self.assertEquals(content, 'retry: 30000\n\n')
+        post = Post.objects.create(message='**Missed**', topic=self.topic, created_by=self.user)
+        content = self.read(self.client.get(self.url, HTTP_LAST_EVENT_ID=str(self.first_post.pk)))
+        self.assertIn('id: {}\nevent: post\n'.format(post.pk), content)
+        self.assertNotIn('keepalive', content)
+        self.assertFalse(bus.has_listeners(self.topic.pk))
+
+    @override_settings(TOPIC_EVENTS_MAX_LISTENERS=0)
+    def test_poll_without_new_posts_reads_the_topic_only(self):
+        with self.assertNumQueries(1):
+            self.read(self.client.get(self.url, HTTP_LAST_EVENT_ID=str(self.first_post.pk)))
@@ -0,0 +1,110 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..export import BoardExport, Checkpoint, export_to_file
+from ..models import Board, Post, Topic
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        other_board = Board.objects.create(name='Python', description='Python board.')
+        self.john = User.objects.create_user(username='john', email='john@doe.com')
+        self.jane = User.objects.create_user(username='jane', email='jane@doe.com')
+        User.objects.create_user(username='nobody')
+        for i in range(3):
+            topic = Topic.objects.create(subject='Topic {}'.format(i), board=self.board, starter=self.john)
+            Post.objects.create(message='Hello, "world"\nline {}'.format(i), topic=topic, created_by=self.john)
+            Post.objects.create(message='Reply {}'.format(i), topic=topic, created_by=self.jane)
+        topic = Topic.objects.create(subject='Elsewhere', board=other_board, starter=self.john)
+        Post.objects.create(message='Not exported', topic=topic, created_by=self.john)
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'board.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_jsonl(self, path, compress=False):
+        with (gzip.open if compress else open)(path, 'rt') as f:
+            return [json.loads(line) for line in f]
+
+
+class ExportBoardTests(ExportTestCase):
+    def test_jsonl(self):
+        call_command('export_board', self.board.pk, self.path, stdout=StringIO())
+        records = self.read_jsonl(self.path)
+        self.assertEquals([record['type'] for record in records],
+                          ['board'] + ['user'] * 2 + ['topic'] * 3 + ['post'] * 6)
+        self.assertEquals([record['username'] for record in records[1:3]], ['john', 'jane'])
+        self.assertEquals(records[-1]['message'], 'Reply 2')
+        self.assertEquals(records[-1]['created_by'], 'jane')
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_gzip(self):
+        path = self.path + '.gz'
+        call_command('export_board', self.board.pk, path, gzip=True, chunk_size=2, stdout=StringIO())
+        self.assertEquals(len(self.read_jsonl(path, compress=True)), 12)
+
+    def test_csv(self):
+        path = os.path.join(self.directory, 'board.csv')
+        call_command('export_board', self.board.pk, path, format='csv', stdout=StringIO())
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEquals(len(rows), 6)
+        self.assertEquals(rows[0]['subject'], 'Topic 0')
+        self.assertEquals(rows[0]['message'], 'Hello, "world"\nline 0')
+
+    def test_resume(self):
+        export = BoardExport(self.board, chunk_size=2)
+        chunks = export.chunks
+
+        def interrupted_chunks(section, after_pk=0):
+            for i, chunk in enumerate(chunks(section, after_pk)):
+                if section == 'posts' and i == 1:
+                    raise KeyboardInterrupt
+                yield chunk
+
+        export.chunks = interrupted_chunks
+        with self.assertRaises(KeyboardInterrupt):
+            export_to_file(export, self.path, compress=True)
+        self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+        # something half written after the checkpoint
+        with open(self.path, 'ab') as f:
+            f.write(b'\x1f\x8b garbage')
+
+        export.chunks = chunks
+        export_to_file(export, self.path, compress=True, resume=True)
+        records = self.read_jsonl(self.path, compress=True)
+        self.assertEquals([record['id'] for record in records if record['type'] == 'post'],
+                          list(Post.objects.filter(topic__board=self.board).order_by('pk').values_list('pk', flat=True)))
+        self.assertEquals(len(records), 12)
+
+    def test_checkpoint_of_another_export(self):
+        open(self.path, 'w').close()
+        Checkpoint(self.path).save({'board': self.board.pk, 'format': 'jsonl', 'compress': False,
+                                    'section': 'posts', 'pk': 1, 'offset': 0})
+        with self.assertRaises(ValueError):
+            export_to_file(BoardExport(self.board, format='csv'), self.path, resume=True)
+
+
+class ExportAdminActionTests(ExportTestCase):
+    def test_streams_the_selected_boards(self):
+        User.objects.create_superuser(username='admin', email='admin@doe.com', password='123')
+        self.client.login(username='admin', password='123')
+        response = self.client.post(reverse('admin:boards_board_changelist'), {
+            'action': 'export_jsonl', '_selected_action': [self.board.pk],
+        })
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEquals(len(lines), 12)
+        self.assertEquals(json.loads(lines[0])['name'], 'Django')
@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.dateparse import parse_datetime
+
+from ..models import MARKDOWN_VERSION, Board, Post, Topic
+
+RECORDS = [
+    {'type': 'board', 'id': 1, 'name': 'Django', 'description': 'Django board.'},
+    {'type': 'board', 'id': 2, 'name': 'Imported', 'description': 'From elsewhere.'},
+    {'type': 'user', 'id': 10, 'username': 'jane', 'email': 'jane@doe.com'},
+    {'type': 'topic', 'id': 100, 'board': 2, 'subject': 'First', 'starter': 'jane', 'views': 7},
+    {'type': 'topic', 'id': 101, 'board': 1, 'subject': 'Second', 'starter': 'john'},
+    {'type': 'post', 'id': 1000, 'topic': 100, 'created_by': 'jane', 'created_at': '2018-05-01T10:00:00+00:00',
+     'message': '**Hello**'},
+    {'type': 'post', 'id': 1001, 'topic': 100, 'created_by': 'bob', 'created_at': '2018-05-03T10:00:00+00:00',
+     'message': 'Welcome'},
+    {'type': 'post', 'id': 1002, 'topic': 101, 'created_by': 'john', 'created_at': '2018-05-02T10:00:00+00:00',
+     'message': 'Hi'},
+    {'type': 'post', 'id': 1003, 'topic': 100, 'created_by': 'jane', 'created_at': '2018-05-02T10:00:00+00:00',
+     'message': '**Hello**'},
+]
+
+
+class ImportJSONLTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.john = User.objects.create_user(username='john', password='123')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'forum.jsonl')
+        self.write(RECORDS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, records):
+        with open(self.path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    def import_dump(self, **options):
+        out = StringIO()
+        call_command('import_jsonl', self.path, batch_size=2, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import(self):
+        out = self.import_dump()
+        self.assertIn('Imported 1 boards, 2 users, 2 topics and 4 posts', out)
+        self.assertEquals(Board.objects.count(), 2)
+        self.assertEquals(self.board.topics.get().starter, self.john)
+        # users missing from the site are created, without a usable password
+        self.assertFalse(User.objects.get(username='bob').has_usable_password())
+        self.assertEquals(User.objects.get(username='jane').email, 'jane@doe.com')
+        self.assertIsNotNone(User.objects.get(username='bob').profile)
+
+    def test_counters(self):
+        self.import_dump()
+        topic = Topic.objects.get(subject='First')
+        self.assertEquals(topic.views, 7)
+        self.assertEquals(topic.posts_count, 3)
+        self.assertEquals(topic.last_updated, parse_datetime('2018-05-03T10:00:00+00:00'))
+        self.assertEquals(topic.last_post.message, 'Welcome')
+        board = topic.board
+        self.assertEquals((board.topics_count, board.posts_count), (1, 3))
+        self.assertEquals(board.last_post, topic.last_post)
+        self.board.refresh_from_db()
+        self.assertEquals((self.board.topics_count, self.board.posts_count), (1, 1))
+        self.assertEquals(User.objects.get(username='jane').profile.posts_count, 2)
+
+    def test_markdown_is_rendered(self):
+        self.import_dump()
+        for post in Post.objects.filter(message='**Hello**'):
+            self.assertEquals(post.message_html, '<p><strong>Hello</strong></p>')
+            self.assertEquals(post.message_html_version, MARKDOWN_VERSION)
+
+    def test_no_render(self):
+        self.import_dump(render=False)
+        self.assertEquals(Post.objects.filter(message_html_version=MARKDOWN_VERSION).count(), 0)
+        self.assertEquals(Post.objects.get(message='Hi').get_message_as_markdown(), '<p>Hi</p>')
+
+    def test_import_twice(self):
+        self.import_dump()
+        out = self.import_dump()
+        self.assertIn('Imported 0 boards, 0 users, 0 topics and 0 posts', out)
+        # 2 boards, jane, 2 topics and 4 posts; john and bob aren't user records
+        self.assertIn('; 9 already there.', out)
+        self.assertEquals(Post.objects.count(), 4)
+        self.assertEquals(Topic.objects.get(subject='First').posts_count, 3)
+
+    def test_resumes_a_partial_import(self):
+        # the second dump has the posts the first one was missing
+        self.write(RECORDS[:-1])
+        self.import_dump()
+        self.write(RECORDS)
+        self.import_dump()
+        self.assertEquals(Post.objects.count(), 4)
+        self.assertEquals(Topic.objects.get(subject='First').posts_count, 3)
+
+    def test_missing_key(self):
+        self.write(RECORDS + [{'type': 'post', 'id': 1004, 'topic': 100, 'message': '?'}])
+        with self.assertRaisesMessage(CommandError, 'Line 10: the post has no created_by.'):
+            self.import_dump()
+
+    def test_unknown_topic(self):
+        self.write(RECORDS + [{'type': 'post', 'id': 1004, 'topic': 999, 'created_by': 'jane', 'message': '?'}])
+        with self.assertRaisesMessage(CommandError, 'Line 10: unknown topic 999.'):
+            self.import_dump()
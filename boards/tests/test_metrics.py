@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import Histogram, load_snapshots, registry
+from ..models import Board, Post, Topic
+from ..viewcount import topic_views
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(REQUEST_METRICS_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        registry.clear()
+        self.addCleanup(topic_views.reset)
+
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=topic, created_by=user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk})
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(self.url)
+        header = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'md;dur=', 'total;dur='):
+            self.assertIn(name, header)
+        self.assertRegex(header, r'desc="[1-9]\d* queries"')
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_off(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_histogram_per_url_name(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(reverse('home'))
+        self.assertEquals(registry.histograms['topic_posts'].count, 2)
+        self.assertEquals(registry.histograms['home'].count, 1)
+        self.assertGreater(registry.histograms['topic_posts'].timings['template'], 0)
+
+    def test_dump_command(self):
+        self.client.get(self.url)
+        registry.snapshot()
+        out = StringIO()
+        call_command('dump_request_metrics', stdout=out)
+        self.assertIn('topic_posts', out.getvalue())
+
+    def test_reset(self):
+        self.client.get(self.url)
+        registry.snapshot()
+        call_command('dump_request_metrics', reset=True, stdout=StringIO())
+        # this process dropped its histograms instead of writing them again
+        registry.snapshot()
+        self.assertEquals(load_snapshots(self.directory), {})
+        self.client.get(self.url)
+        registry.snapshot()
+        self.assertEquals(load_snapshots(self.directory)['topic_posts'].count, 1)
+
+
+class HistogramTests(TestCase):
+    def test_percentile_and_merge(self):
+        histogram = Histogram()
+        for duration in (0.003, 0.004, 0.004, 0.150):
+            histogram.add(duration, 2, {'db': 0.001})
+        self.assertEquals(histogram.percentile(50), 5)
+        self.assertEquals(histogram.percentile(99), 200)
+        histogram.merge(Histogram(histogram.as_dict()))
+        self.assertEquals(histogram.count, 8)
+        self.assertEquals(histogram.queries, 16)
@@ -0,0 +1,109 @@
+import re
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import Board, Post, Topic
+from ..pagination import encode_cursor
+from ..views import (BoardListView, PostListView, TopicListView, board_topics_last_modified,
+                     topic_posts_last_modified)
+
+# a plain table scan, as opposed to "SCAN x USING (COVERING) INDEX"
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+
+
+# The hot queries of boards/views.py and boards/models.py must be answered
+# from an index: no full table scan and no temporary B-tree to sort the rows.
+# The queries are the ones the views send, captured while their code runs,
+# so a change to a view is checked here too.
+@unittest.skipUnless(connection.vendor == 'sqlite', 'The query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        self.post = Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=self.user)
+        self.factory = RequestFactory()
+
+    def get_plans(self, run):
+        """Runs `run` and returns the SELECTs it sends with their query plan."""
+        with CaptureQueriesContext(connection) as context:
+            run()
+        selects = [query['sql'] for query in context if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, 'No query to check')
+        with connection.cursor() as cursor:
+            for sql in selects:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                yield sql, '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assertIndexed(self, run, scans=()):
+        """Runs `run` and checks the plan of every SELECT it sends, `scans` are the tables it may scan."""
+        for sql, plan in self.get_plans(run):
+            for line in plan.splitlines():
+                match = FULL_SCAN.search(line.strip())
+                self.assertFalse(match and match.group('table') not in scans,
+                                 'Full table scan in:\n{}\n{}'.format(sql, plan))
+                self.assertNotIn('TEMP B-TREE', line, 'Sort without an index in:\n{}\n{}'.format(sql, plan))
+
+    def list_page(self, view_class, data=None, **kwargs):
+        view = view_class()
+        view.request = self.factory.get('/', data)
+        view.args, view.kwargs = (), kwargs
+        queryset = view.get_queryset()
+        if view.paginate_by is None:
+            return list(queryset)
+        _, _, object_list, _ = view.paginate_queryset(queryset, view.paginate_by)
+        return list(object_list)
+
+    def cursor(self, direction):
+        return encode_cursor({'d': direction, 'k': [timezone.now().isoformat(), 10]})
+
+    def test_home(self):
+        # every board is on the page, their table is the one read in full
+        self.assertIndexed(lambda: self.list_page(BoardListView), scans=[Board._meta.db_table])
+
+    def test_board_topics(self):
+        self.assertIndexed(lambda: self.list_page(TopicListView, pk=self.board.pk))
+
+    def test_board_topics_offset_page(self):
+        self.assertIndexed(lambda: self.list_page(TopicListView, {'page': 1}, pk=self.board.pk))
+
+    def test_board_topics_next_page(self):
+        self.assertIndexed(lambda: self.list_page(TopicListView, {'cursor': self.cursor('next')}, pk=self.board.pk))
+
+    def test_board_topics_previous_page(self):
+        self.assertIndexed(lambda: self.list_page(TopicListView, {'cursor': self.cursor('prev')}, pk=self.board.pk))
+
+    def test_board_topics_last_modified(self):
+        self.assertIndexed(lambda: board_topics_last_modified(self.factory.get('/'), self.board.pk))
+
+    def test_topic_posts(self):
+        self.assertIndexed(lambda: self.list_page(PostListView, pk=self.board.pk, topic_pk=self.topic.pk))
+
+    def test_topic_posts_offset_page(self):
+        self.assertIndexed(lambda: self.list_page(PostListView, {'page': 1}, pk=self.board.pk, topic_pk=self.topic.pk))
+
+    def test_topic_posts_next_page(self):
+        self.assertIndexed(lambda: self.list_page(
+            PostListView, {'cursor': self.cursor('next')}, pk=self.board.pk, topic_pk=self.topic.pk
+        ))
+
+    def test_topic_posts_last_modified(self):
+        self.assertIndexed(lambda: topic_posts_last_modified(self.factory.get('/'), self.board.pk, self.topic.pk))
+
+    def test_topic_posts_last_modified_reads_no_post(self):
+        # an aggregate over the posts is answered from an index too, but reads
+        # every post of the topic on each request
+        run = lambda: topic_posts_last_modified(self.factory.get('/'), self.board.pk, self.topic.pk)
+        for sql, plan in self.get_plans(run):
+            self.assertNotIn(Post._meta.db_table, plan, 'Posts read in:\n{}\n{}'.format(sql, plan))
+
+    def test_last_three_posts(self):
+        self.assertIndexed(lambda: list(self.topic.get_last_three_post()))
+
+    def test_posts_of_an_author(self):
+        self.assertIndexed(lambda: list(Post.objects.filter(created_by=self.user)))
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import routers
+from ..models import Board, Post, Topic
+from ..routers import ReplicaRouter, read_from_replica
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        routers.start_request(pinned=False)
+
+    def test_reads_from_primary_by_default(self):
+        self.assertEquals(self.router.db_for_read(Topic), 'default')
+
+    def test_reads_from_replica_in_read_scope(self):
+        with read_from_replica():
+            self.assertEquals(self.router.db_for_read(Topic), 'replica1')
+            self.assertEquals(self.router.db_for_read(Post), 'replica1')
+            # sessions and users come from the primary
+            self.assertEquals(self.router.db_for_read(Session), 'default')
+            self.assertEquals(self.router.db_for_read(User), 'default')
+        self.assertEquals(self.router.db_for_read(Topic), 'default')
+
+    def test_pinned_request_reads_from_primary(self):
+        routers.start_request(pinned=True)
+        with read_from_replica():
+            self.assertEquals(self.router.db_for_read(Topic), 'default')
+
+    def test_writes_go_to_primary(self):
+        with read_from_replica():
+            self.assertEquals(self.router.db_for_write(Post), 'default')
+        self.assertTrue(routers.has_written())
+
+    def test_session_writes_dont_pin(self):
+        self.router.db_for_write(Session)
+        self.assertFalse(routers.has_written())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaStickinessTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=user)
+        self.client.login(username='john', password='123')
+
+    def test_reply_pins_the_client(self):
+        url = reverse('reply_topic', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        response = self.client.post(url, {'message': 'hello'})
+        cookie = response.cookies['pin_primary']
+        self.assertEquals(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+    def test_read_doesnt_pin(self):
+        self.client.cookies['pin_primary'] = '1'
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('pin_primary', response.cookies)
+
+
+class TwoDatabasesTests(TestCase):
+    # a second SQLite file stands in for a replica, nothing copies the rows
+    # of the primary to it
+    multi_db = True
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections.databases['replica_test'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+        }
+        self.addCleanup(self.remove_replica)
+        call_command('migrate', database='replica_test', verbosity=0)
+        settings_override = override_settings(DATABASE_REPLICAS=['replica_test'])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.board = Board.objects.create(name='Primary board', description='Only on the primary.')
+        Board.objects.using('replica_test').create(name='Replica board', description='Only on the replica.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=user)
+
+    def remove_replica(self):
+        connections['replica_test'].close()
+        del connections.databases['replica_test']
+        delattr(connections._connections, 'replica_test')
+
+    def test_list_views_read_from_replica(self):
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Replica board')
+        self.assertNotContains(response, 'Primary board')
+
+    def test_reads_its_writes_after_a_reply(self):
+        self.client.login(username='john', password='123')
+        url = reverse('reply_topic', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        self.client.post(url, {'message': 'hello'})
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Primary board')
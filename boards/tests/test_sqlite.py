@@ -0,0 +1,18 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SQLitePragmasTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA {}'.format(name))
+            return cursor.fetchone()[0]
+
+    def test_profile_is_applied(self):
+        # the test database is in memory, where journal_mode can't be WAL
+        self.assertEquals(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEquals(self.pragma('busy_timeout'), 5000)
+        self.assertEquals(self.pragma('temp_store'), 2)  # MEMORY
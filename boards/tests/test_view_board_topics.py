@@ -1,8 +1,15 @@
-from django.test import TestCase
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse, resolve
+from django.utils import timezone
 
 from ..views import TopicListView
-from ..models import Board
+from ..models import Board, Post, Topic
+from ..pagination import KeysetPaginator
 
 
 # Create your tests here.
@@ -46,3 +53,78 @@ class BoardTopicsTests(TestCase):
         self.assertContains(response, 'href="{0}"'.format(homepage_url))
         self.assertContains(response, 'href="{0}"'.format(new_topic_url))
 
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class BoardTopicsPageLinksTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django discussion board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.url = reverse('board_topics', kwargs={'pk': self.board.pk})
+
+    def create_topic(self, posts):
+        topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        for i in range(posts):
+            Post.objects.create(message='Lorem ipsum dolor sit amet', topic=topic, created_by=self.user)
+        return topic
+
+    def test_page_links_come_from_the_counter(self):
+        topic = self.create_topic(posts=5)
+        response = self.client.get(self.url)
+        topic_url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': topic.pk})
+        self.assertContains(response, 'href="{0}?page=3"'.format(topic_url))
+        self.assertNotContains(response, 'href="{0}?page=4"'.format(topic_url))
+        self.assertEquals(response.context['topics'][0].replies, 4)
+
+    def test_query_count_does_not_depend_on_topics(self):
+        self.create_topic(posts=3)
+        with CaptureQueriesContext(connection) as one_topic:
+            self.client.get(self.url)
+        for i in range(10):
+            self.create_topic(posts=3)
+        with CaptureQueriesContext(connection) as many_topics:
+            self.client.get(self.url)
+        self.assertEquals(len(one_topic), len(many_topics))
+
+
+class BoardTopicsKeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django discussion board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        # 40 topics, several sharing the same last_updated to exercise the pk tie-breaker
+        now = timezone.now()
+        for i in range(40):
+            topic = Topic.objects.create(subject='Topic {}'.format(i), board=self.board, starter=user)
+            Topic.objects.filter(pk=topic.pk).update(last_updated=now - timedelta(minutes=i // 3))
+        self.url = reverse('board_topics', kwargs={'pk': self.board.pk})
+        self.expected = list(Topic.objects.order_by('-last_updated', '-pk').values_list('pk', flat=True))
+
+    def get_page(self, cursor):
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEquals(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_walk_forwards_and_backwards(self):
+        pages = [self.get_page('')]
+        while pages[-1].has_next():
+            pages.append(self.get_page(pages[-1].next_cursor))
+        self.assertEquals(len(pages), 3)
+        self.assertEquals([topic.pk for page in pages for topic in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = self.get_page(pages[-1].previous_cursor)
+        self.assertEquals([topic.pk for topic in previous], [topic.pk for topic in pages[1]])
+
+    def test_last_page(self):
+        page = self.get_page(KeysetPaginator.last_cursor)
+        self.assertEquals([topic.pk for topic in page], self.expected[-16:])
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+
+    def test_uses_stored_count(self):
+        response = self.client.get(self.url, {'cursor': ''})
+        self.assertContains(response, '40 in total')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEquals(response.status_code, 404)
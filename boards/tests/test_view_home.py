@@ -1,8 +1,12 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse, resolve
 
+from .. import fragments
 from ..views import BoardListView
-from ..models import Board
+from ..models import Board, Post, Topic
 
 
 # Create your tests here.
@@ -30,3 +34,82 @@ class HomeTests(TestCase):
         board_topics_url = reverse('board_topics', kwargs={'pk': self.board.pk})
         self.assertContains(self.response, 'href="{0}"'.format(board_topics_url))
 
+
+
+class HomeCountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.board = Board.objects.create(name='Django', description='Django test board.')
+        self.topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=self.user)
+        self.last_post = Post.objects.create(message='Second post', topic=self.topic, created_by=self.user)
+
+    def test_counters_follow_new_rows(self):
+        self.board.refresh_from_db()
+        self.assertEquals(self.board.topics_count, 1)
+        self.assertEquals(self.board.posts_count, 2)
+        self.assertEquals(self.board.last_post, self.last_post)
+
+    def test_counters_follow_deletes(self):
+        self.last_post.delete()
+        self.board.refresh_from_db()
+        self.assertEquals(self.board.posts_count, 1)
+        self.assertEquals(self.board.last_post, self.topic.posts.get())
+
+        self.topic.delete()
+        self.board.refresh_from_db()
+        self.assertEquals(self.board.topics_count, 0)
+        self.assertEquals(self.board.posts_count, 0)
+        self.assertIsNone(self.board.last_post)
+
+    def test_deleting_the_newest_topic_keeps_a_last_post(self):
+        newest = Topic.objects.create(subject='Newer', board=self.board, starter=self.user)
+        Post.objects.create(message='Newest post', topic=newest, created_by=self.user)
+        newest.delete()
+        self.board.refresh_from_db()
+        self.assertEquals(self.board.topics_count, 1)
+        self.assertEquals(self.board.posts_count, 2)
+        self.assertEquals(self.board.last_post, self.last_post)
+
+    def test_home_is_a_single_query(self):
+        # the number of boards must not change the number of queries
+        for i in range(5):
+            board = Board.objects.create(name='Board {}'.format(i), description='Another board.')
+            topic = Topic.objects.create(subject='Hello', board=board, starter=self.user)
+            Post.objects.create(message='Lorem ipsum', topic=topic, created_by=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'By john at')
+
+    def test_home_is_cached_until_a_post_is_written(self):
+        self.client.get(reverse('home'))
+        # only the boards, for the ETag, the table is not rendered again
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'By john at')
+        Post.objects.create(message='Third post', topic=self.topic, created_by=self.user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '<td class="align-middle">3</td>', html=False)
+
+
+# on_commit callbacks only run outside of TestCase's transaction
+class FragmentVersionsTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+
+    def test_versions_are_replaced_after_the_commit(self):
+        version = fragments.get_version('home')
+        with transaction.atomic():
+            topic = Topic.objects.create(subject='Hello', board=self.board, starter=self.user)
+            Post.objects.create(message='Lorem ipsum', topic=topic, created_by=self.user)
+            self.assertEquals(fragments.get_version('home'), version)
+        self.assertNotEquals(fragments.get_version('home'), version)
+
+    def test_board_change_replaces_the_versions(self):
+        home, board = fragments.get_version('home'), fragments.get_version('board', self.board.pk)
+        self.board.description = 'Another description.'
+        self.board.save()
+        self.assertNotEquals(fragments.get_version('home'), home)
+        self.assertNotEquals(fragments.get_version('board', self.board.pk), board)
@@ -1,3 +1,6 @@
+from unittest import mock
+
+from django.db import DatabaseError
 from django.test import TestCase
 from django.urls import reverse, resolve
 from django.contrib.auth.models import User
@@ -67,6 +70,19 @@ class NewTopicTests(TestCase):
         self.assertTrue(Topic.objects.exists())
         self.assertTrue(Post.objects.exists())
 
+    # a failure while creating the first post must not leave an empty topic
+    def test_new_topic_is_atomic(self):
+        url = reverse('new_topic', kwargs={'pk': 1})
+        data = {
+            'subject': 'Test title',
+            'message': 'Lorem ipsum dolor sit amet'
+        }
+        with mock.patch('boards.views.Post.objects.create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url, data)
+        self.assertFalse(Topic.objects.exists())
+        self.assertEquals(Board.objects.get(pk=1).topics_count, 0)
+
     # Invalid post data should not redirect
     # The expected behavior is to show the form again with validation errors
     def test_new_topic_invalid_post_data(self):
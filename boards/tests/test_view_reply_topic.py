@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
@@ -23,10 +25,54 @@ class ReplyTopicTestCase(TestCase):
 #
 #
 class SuccessfulReplyTopicTests(ReplyTopicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username=self.username, password=self.password)
+        self.response = self.client.post(self.url, {'message': 'hello, world!'})
+
     def test_redirection(self):
         # A valid form submission should redirect the user
         url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
         topic_posts_url = '{url}?page=1#2'.format(url=url)
         self.assertRedirects(self.response, topic_posts_url)
 
-# class InvalidReplyTopicTests(ReplyTopicTestCase):
\ No newline at end of file
+    def test_reply_updates_topic(self):
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.posts_count, 2)
+        self.assertEquals(self.topic.last_updated, Post.objects.latest('created_at').created_at)
+
+    def test_redirects_to_last_page(self):
+        with self.settings(POSTS_PER_PAGE=2):
+            response = self.client.post(self.url, {'message': 'third'})
+        post = Post.objects.latest('pk')
+        url = reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': self.topic.pk})
+        self.assertRedirects(response, '{url}?page=2#{id}'.format(url=url, id=post.pk), fetch_redirect_response=False)
+
+    def test_reply_is_last_post(self):
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.last_post, Post.objects.latest('pk'))
+
+    def test_delete_last_post(self):
+        first_post = self.topic.posts.earliest('pk')
+        Post.objects.latest('pk').delete()
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.last_post, first_post)
+
+    def test_reply_page_queries(self):
+        # the same number of queries however many posts and authors the preview shows
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        for i in range(3):
+            user = User.objects.create_user(username='user{}'.format(i), password='123')
+            Post.objects.create(message='Post {}'.format(i), topic=self.topic, created_by=user)
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_without_returning(self):
+        # databases without UPDATE ... RETURNING read the counter again
+        with mock.patch('boards.models.supports_returning', return_value=False):
+            self.client.post(self.url, {'message': 'third'})
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.posts_count, 3)
+
+# class InvalidReplyTopicTests(ReplyTopicTestCase):
@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import resolve, reverse
+
+from ..models import Board, Post, Topic
+from ..search import SimpleSearchBackend, SQLiteSearchBackend, get_backend
+from ..views import search
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        self.django = Board.objects.create(name='Django', description='Django board.')
+        self.python = Board.objects.create(name='Python', description='Python board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Migrations', board=self.django, starter=user)
+        self.first = Post.objects.create(message='How do I squash migrations?', topic=self.topic, created_by=user)
+        self.second = Post.objects.create(message='Use squashmigrations.', topic=self.topic, created_by=user)
+        other = Topic.objects.create(subject='Packaging', board=self.python, starter=user)
+        self.third = Post.objects.create(message='My migrations to poetry failed.', topic=other, created_by=user)
+
+
+class SearchViewTests(SearchTestCase):
+    def test_view_function(self):
+        view = resolve('/boards/search/')
+        self.assertEquals(view.func, search)
+
+    def test_results(self):
+        response = self.client.get(reverse('search'), {'q': 'squash'})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context['posts'], [self.first])
+        self.assertContains(response, 'href="{0}"'.format(
+            reverse('topic_posts', kwargs={'pk': self.django.pk, 'topic_pk': self.topic.pk})
+        ))
+
+    def test_board_filter(self):
+        response = self.client.get(reverse('search'), {'q': 'poetry', 'board': self.django.pk})
+        self.assertEquals(response.context['posts'], [])
+        self.assertContains(response, 'No results')
+
+    def test_invalid_board_filter(self):
+        response = self.client.get(reverse('search'), {'q': 'poetry', 'board': 'abc'})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context['posts'], [self.third])
+        response = self.client.get(reverse('search'), {'q': 'poetry', 'board': '999'})
+        self.assertEquals(response.status_code, 404)
+
+
+class SearchBackendTestsMixin:
+    def get_backend(self):
+        raise NotImplementedError
+
+    def test_subject_match_ranks_first(self):
+        # both topics mention migrations, only the first one in its subject
+        self.assertEquals(self.get_backend().search('migrations')[-1], self.third.pk)
+
+    def test_all_terms_must_match(self):
+        self.assertEquals(self.get_backend().search('squash migrations'), [self.first.pk])
+
+    def test_board_filter(self):
+        self.assertEquals(self.get_backend().search('poetry', board_pk=self.python.pk), [self.third.pk])
+        self.assertEquals(self.get_backend().search('poetry', board_pk=self.django.pk), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        backend = self.get_backend()
+        self.second.message = 'Run makemigrations --squash'
+        self.second.save()
+        self.third.delete()
+        self.assertEquals(backend.search('makemigrations'), [self.second.pk])
+        self.assertEquals(backend.search('poetry'), [])
+
+        self.topic.subject = 'Schema changes'
+        self.topic.save()
+        self.assertEquals(set(backend.search('schema')), {self.first.pk, self.second.pk})
+
+
+class SQLiteSearchBackendTests(SearchBackendTestsMixin, SearchTestCase):
+    def get_backend(self):
+        # the index is updated by the signals through the configured backend
+        self.assertIsInstance(get_backend(), SQLiteSearchBackend)
+        return get_backend()
+
+    def test_board_is_not_a_term(self):
+        self.assertEquals(self.get_backend().search(str(self.python.pk)), [])
+
+    def test_only_the_newest_matches_are_ranked(self):
+        backend = self.get_backend()
+        backend.candidates = 1
+        self.addCleanup(delattr, backend, 'candidates')
+        self.assertEquals(backend.search('migrations'), [self.third.pk])
+
+
+class SimpleSearchBackendTests(SearchBackendTestsMixin, SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = SimpleSearchBackend()
+        self.backend.load()
+
+    def get_backend(self):
+        return self.backend
+
+    def test_index_follows_edits_and_deletes(self):
+        # this index isn't the configured one, feed it the changes by hand
+        self.second.message = 'Run makemigrations --squash'
+        self.backend.index_post(self.second)
+        self.backend.remove_post(self.third.pk)
+        self.assertEquals(self.backend.search('makemigrations'), [self.second.pk])
+        self.assertEquals(self.backend.search('poetry'), [])
+
+        self.topic.subject = 'Schema changes'
+        self.topic.save()
+        self.backend.index_topic(self.topic)
+        self.assertEquals(set(self.backend.search('schema')), {self.first.pk, self.second.pk})
@@ -1,9 +1,18 @@
+import tempfile
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import resolve, reverse
 
+from .. import fragments
 from ..models import Board, Post, Topic
-from ..views import PostListView
+from ..viewcount import topic_views
+from ..views import PostListView, topic_posts_last_modified
 
 
 class TopicPostsTests(TestCase):
@@ -15,9 +24,293 @@ class TopicPostsTests(TestCase):
         url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk})
         self.response = self.client.get(url)
 
+    # reading a topic buffers a view, a flush must not happen in another test
+    def tearDown(self):
+        topic_views.reset()
+
     def test_status_code(self):
         self.assertEquals(self.response.status_code, 200)
 
     def test_view_function(self):
         view = resolve('/boards/1/topics/5')
-        self.assertEquals(view.func.view_class, PostListView)
\ No newline at end of file
+        self.assertEquals(view.func.view_class, PostListView)
+
+
+class TopicPostsQueriesTests(TestCase):
+    def setUp(self):
+        self.board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+
+    def tearDown(self):
+        topic_views.reset()
+
+    def create_topic(self, posts):
+        topic = Topic.objects.create(subject='Hello, world', board=self.board, starter=self.user)
+        for i in range(posts):
+            # every post by a different author
+            author = User.objects.create_user(username='user{}-{}'.format(topic.pk, i), password='123')
+            Post.objects.create(message='Lorem ipsum dolor sit amet', topic=topic, created_by=author)
+        return reverse('topic_posts', kwargs={'pk': self.board.pk, 'topic_pk': topic.pk})
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEquals(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_depend_on_posts(self):
+        self.client.login(username='john', password='123')
+        small_topic_url = self.create_topic(posts=1)
+        full_topic_url = self.create_topic(posts=15)
+        # warm up the session so both requests do the same session work
+        self.client.get(small_topic_url)
+        self.client.get(full_topic_url)
+        self.assertEquals(self.count_queries(small_topic_url), self.count_queries(full_topic_url))
+
+    def test_author_posts_count(self):
+        url = self.create_topic(posts=2)
+        Post.objects.create(message='Another post', topic=Topic.objects.first(), created_by=User.objects.last())
+        response = self.client.get(url)
+        counts = [post.author_posts_count for post in response.context['posts']]
+        self.assertEquals(counts, [1, 2, 2])
+
+    def test_author_posts_count_after_a_delete(self):
+        url = self.create_topic(posts=1)
+        author = User.objects.last()
+        Post.objects.create(message='Another post', topic=Topic.objects.first(), created_by=author)
+        author.posts.first().delete()
+        response = self.client.get(url)
+        self.assertEquals([post.author_posts_count for post in response.context['posts']], [1])
+
+
+class TopicPostsFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=board, starter=self.user)
+        self.post = Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=self.user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': self.topic.pk})
+
+    def tearDown(self):
+        topic_views.reset()
+
+    def get_posts_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        posts_table = connection.ops.quote_name(Post._meta.db_table)
+        return response, [query for query in context if query['sql'].startswith('SELECT') and
+                          'FROM {}'.format(posts_table) in query['sql']]
+
+    def test_anonymous_page_is_cached(self):
+        self.get_posts_queries()
+        response, queries = self.get_posts_queries()
+        self.assertEquals(queries, [])
+        self.assertContains(response, 'Lorem ipsum dolor sit amet')
+
+    def test_new_post_invalidates_the_page(self):
+        self.get_posts_queries()
+        Post.objects.create(message='A brand new reply', topic=self.topic, created_by=self.user)
+        response, queries = self.get_posts_queries()
+        self.assertContains(response, 'A brand new reply')
+
+    def test_edited_post_invalidates_the_page(self):
+        self.get_posts_queries()
+        self.post.message = 'Edited message'
+        self.post.save()
+        response, queries = self.get_posts_queries()
+        self.assertContains(response, 'Edited message')
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                  'LOCATION': location}}
+            with self.settings(CACHES=caches):
+                self.get_posts_queries()
+                response, queries = self.get_posts_queries()
+                self.assertEquals(queries, [])
+                self.post.message = 'Edited message'
+                self.post.save()
+                response, queries = self.get_posts_queries()
+                self.assertContains(response, 'Edited message')
+
+    def test_logged_in_users_are_not_served_from_cache(self):
+        # the page has an edit link for the author's own posts
+        self.client.login(username='john', password='123')
+        self.get_posts_queries()
+        response, queries = self.get_posts_queries()
+        self.assertEquals(len(queries), 1)
+        self.assertContains(response, 'Edit')
+
+
+class TopicPostsConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        topic_views.reset()
+        board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=board, starter=self.user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=self.user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': self.topic.pk})
+        self.response = self.client.get(self.url)
+
+    def tearDown(self):
+        topic_views.reset()
+
+    def test_validators(self):
+        self.assertTrue(self.response.has_header('ETag'))
+        self.assertTrue(self.response.has_header('Last-Modified'))
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEquals(response.status_code, 304)
+
+    def test_modified_after_a_reply(self):
+        Post.objects.create(message='A brand new reply', topic=self.topic, created_by=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, 'A brand new reply')
+
+    def test_last_modified_after_an_edit(self):
+        post = self.topic.posts.get()
+        post.message = 'Edited message'
+        post.save()
+        self.topic.refresh_from_db()
+        self.assertIsNotNone(self.topic.last_edited)
+        last_modified = topic_posts_last_modified(RequestFactory().get('/'), self.topic.board.pk, self.topic.pk)
+        self.assertEquals(last_modified, self.topic.last_edited)
+
+    def test_etag_does_not_depend_on_the_cache(self):
+        # another process: its cache has none of the versions of this one
+        cache.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEquals(response.status_code, 304)
+
+    def test_modified_by_a_write_this_process_did_not_see(self):
+        key = fragments.version_key('topic', self.topic.pk)
+        version = cache.get(key)
+        Post.objects.create(message='A brand new reply', topic=self.topic, created_by=self.user)
+        # written by another process, the fragment version here is the old one
+        cache.set(key, version, None)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, 'A brand new reply')
+
+    def test_etag_depends_on_the_user(self):
+        self.client.login(username='john', password='123')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEquals(response.status_code, 200)
+
+    def test_not_modified_is_still_a_view(self):
+        self.client.cookies.clear()
+        self.client.get(self.url, HTTP_IF_NONE_MATCH=self.response['ETag'])
+        self.assertEquals(topic_views.get_pending(self.topic.pk), 2)
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE_TIMEOUT=60)
+class TopicPostsPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        board = Board.objects.create(name='Django', description='Django board.')
+        self.user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=board, starter=self.user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=self.user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': self.topic.pk})
+
+    def tearDown(self):
+        topic_views.reset()
+
+    def test_page_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(self.url)
+        # only the topic row is read, anonymous visitors have no session
+        self.assertEquals(len(context), 1)
+        self.assertEquals(first.content, second.content)
+
+    def test_cached_page_has_no_cookies_of_another_visitor(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.cookies.clear()
+        self.client.cookies['viewed_topics'] = 'tampered'
+        response = self.client.get(self.url)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEquals(response.cookies['viewed_topics'].value, self.client.cookies['viewed_topics'].value)
+
+    def test_cached_page_keeps_the_viewed_topics_of_each_visitor(self):
+        other_topic = Topic.objects.create(subject='Other', board=self.topic.board, starter=self.user)
+        other_url = reverse('topic_posts', kwargs={'pk': other_topic.board.pk, 'topic_pk': other_topic.pk})
+        first, second = Client(), Client()
+        first.get(self.url)
+        # the second visitor gets the page cached for the first one
+        second.get(other_url)
+        second.get(self.url)
+        response = second.get(self.url)
+        self.assertNotIn('viewed_topics', response.cookies)
+        topic_views.reset()
+        second.get(other_url)
+        self.assertEquals(topic_views.get_pending(other_topic.pk), 0)
+        self.assertEquals(topic_views.get_pending(self.topic.pk), 0)
+
+    def test_reply_invalidates_the_page(self):
+        self.client.get(self.url)
+        Post.objects.create(message='A brand new reply', topic=self.topic, created_by=self.user)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'A brand new reply')
+
+
+@override_settings(TOPIC_VIEWS_FLUSH_INTERVAL=3600, TOPIC_VIEWS_FLUSH_SIZE=100)
+class TopicViewsCounterTests(TestCase):
+    def setUp(self):
+        topic_views.reset()
+        board = Board.objects.create(name='Django', description='Django board.')
+        user = User.objects.create_user(username='john', email='john@doe.com', password='123')
+        self.topic = Topic.objects.create(subject='Hello, world', board=board, starter=user)
+        Post.objects.create(message='Lorem ipsum dolor sit amet', topic=self.topic, created_by=user)
+        self.url = reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': self.topic.pk})
+
+    def tearDown(self):
+        topic_views.reset()
+
+    def test_view_is_buffered(self):
+        # reading a topic must not write the views to the database
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.views, 0)
+        self.assertEquals(topic_views.get_pending(self.topic.pk), 1)
+
+    def test_flush_writes_views(self):
+        self.client.get(self.url)
+        self.client.cookies.clear()
+        self.client.get(self.url)
+        self.assertEquals(topic_views.flush(), 2)
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.views, 2)
+        self.assertEquals(topic_views.get_pending(self.topic.pk), 0)
+
+    @override_settings(TOPIC_VIEWS_FLUSH_SIZE=1)
+    def test_flush_when_buffer_is_full(self):
+        self.client.get(self.url)
+        self.topic.refresh_from_db()
+        self.assertEquals(self.topic.views, 1)
+
+    def test_anonymous_reader_has_no_session(self):
+        self.client.get(self.url)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    @override_settings(VIEWED_TOPICS_MAX=2)
+    def test_oldest_viewed_topic_is_forgotten(self):
+        board = self.topic.board
+        urls = [self.url]
+        for i in range(2):
+            topic = Topic.objects.create(subject='Topic {}'.format(i), board=board, starter=self.topic.starter)
+            urls.append(reverse('topic_posts', kwargs={'pk': board.pk, 'topic_pk': topic.pk}))
+        for url in urls:
+            self.client.get(url)
+        # the first topic was pushed out by the two others
+        self.client.get(urls[0])
+        self.assertEquals(topic_views.get_pending(self.topic.pk), 2)
+        self.client.get(urls[2])
+        self.assertEquals(sum(topic_views.pending.values()), 4)
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.http import base36_to_int, int_to_base36
+
+logger = logging.getLogger(__name__)
+
+
+class TopicViewCounter:
+    """
+    Collects topic views in memory and writes them to the database in
+    batches, so reading a topic doesn't UPDATE the Topic row.
+
+    Every process keeps its own buffer. It is flushed once it holds
+    TOPIC_VIEWS_FLUSH_SIZE views or is older than TOPIC_VIEWS_FLUSH_INTERVAL
+    seconds (checked when a request finishes), and when the WSGI process
+    exits (see webBoard/wsgi.py).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.last_flush = time.monotonic()
+
+    def increment(self, topic_pk):
+        with self.lock:
+            self.pending[topic_pk] += 1
+
+    def reset(self):
+        """Drops the buffered views without writing them, between tests."""
+        with self.lock:
+            self.pending = Counter()
+            self.last_flush = time.monotonic()
+
+    def get_pending(self, topic_pk):
+        return self.pending.get(topic_pk, 0)
+
+    def should_flush(self):
+        if not self.pending:
+            return False
+        if sum(self.pending.values()) >= settings.TOPIC_VIEWS_FLUSH_SIZE:
+            return True
+        return time.monotonic() - self.last_flush >= settings.TOPIC_VIEWS_FLUSH_INTERVAL
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        from .models import Topic
+
+        # topics that got the same number of views share a single UPDATE
+        by_amount = defaultdict(list)
+        for topic_pk, amount in pending.items():
+            by_amount[amount].append(topic_pk)
+        try:
+            with transaction.atomic():
+                for amount, topic_pks in by_amount.items():
+                    Topic.objects.filter(pk__in=topic_pks).update(views=F('views') + amount)
+        except Exception:
+            # put the views back, they will be retried with the next flush
+            with self.lock:
+                self.pending.update(pending)
+            raise
+        return sum(pending.values())
+
+
+topic_views = TopicViewCounter()
+
+
+def flush_on_exit():
+    try:
+        topic_views.flush()
+    except Exception:
+        logger.exception('Could not flush %d buffered topic views', sum(topic_views.pending.values()))
+
+
+class ViewedTopics:
+    """
+    The topics a browser already viewed, so a reload doesn't count as a new
+    view. They are kept in a signed cookie instead of the session, so
+    anonymous readers don't get a session row, and only the
+    VIEWED_TOPICS_MAX most recently viewed topics are remembered.
+    """
+
+    cookie_name = 'viewed_topics'
+    salt = 'boards.viewcount'
+
+    def __init__(self, request):
+        value = request.get_signed_cookie(self.cookie_name, default='', salt=self.salt)
+        try:
+            self.topics = [base36_to_int(pk) for pk in value.split('.') if pk]
+        except ValueError:
+            self.topics = []
+        self.changed = False
+
+    def add(self, topic_pk):
+        """Marks the topic as the most recently viewed, returns whether it is a new view."""
+        if self.topics and self.topics[-1] == topic_pk:
+            return False
+        new = topic_pk not in self.topics
+        if not new:
+            self.topics.remove(topic_pk)
+        self.topics.append(topic_pk)
+        del self.topics[:-settings.VIEWED_TOPICS_MAX]
+        self.changed = True
+        return new
+
+    def set_cookie(self, response):
+        response.set_signed_cookie(
+            self.cookie_name, '.'.join(int_to_base36(pk) for pk in self.topics), salt=self.salt,
+            max_age=settings.VIEWED_TOPICS_COOKIE_AGE, httponly=True
+        )
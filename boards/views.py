@@ -1,10 +1,22 @@
-from django.db.models import Count
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import Board, Topic, Post
+from . import events, fragments
 from .forms import NewTopicForm, PostForm
+from .pagecache import anonymous_page_cache, page_etag
+from .pagination import KeysetPaginationMixin
+from .routers import replica_view
+from .search import search_posts
+from .viewcount import ViewedTopics, topic_views
 from django.views.generic import CreateView
 from django.urls import reverse_lazy, reverse
 from django.views.generic import UpdateView, ListView
+from django.views.decorators.http import condition
 from django.utils import timezone
 
 # the person must  be logged in to see the view- new_topic
@@ -16,28 +28,117 @@ from django.utils.decorators import method_decorator
 from django.contrib.auth.models import User
 
 
+# Validators for conditional GET and keys of the page cache, computed
+# without rendering the page. The version of a page comes from the rows it
+# shows, not from the fragment versions (see boards/fragments.py): those
+# live in the cache, which may be one per process (LocMemCache), and a
+# process that never saw a write would answer 304 with a stale page. The
+# rows are read once per request, the view uses them too.
+def read_once(request, key, read):
+    state = request.__dict__.setdefault('page_state', {})
+    if key not in state:
+        state[key] = read()
+    return state[key]
+
+
+def state_version(*values):
+    return hashlib.md5(repr(values).encode()).hexdigest()[:12]
+
+
+def home_boards(request):
+    return read_once(request, 'boards', lambda: list(Board.objects.select_related('last_post__created_by')))
+
+
+def home_version(request):
+    return state_version(*[
+        (board.pk, board.name, board.description, board.topics_count, board.posts_count, board.last_post_id)
+        for board in home_boards(request)
+    ])
+
+
+def board_topics_version(request, pk):
+    return state_version(pk, read_once(request, ('board', pk), lambda: Board.objects.filter(pk=pk).values_list(
+        'name', 'topics_count', 'posts_count', 'last_post_id'
+    ).first()))
+
+
+def board_topics_last_modified(request, pk):
+    return Topic.objects.filter(board__pk=pk).aggregate(last=Max('last_updated'))['last']
+
+
+def topic_row(request, pk, topic_pk):
+    # new posts move last_updated, edits and deletions last_edited
+    return read_once(request, ('topic', topic_pk), lambda: Topic.objects.filter(board__pk=pk, pk=topic_pk).values_list(
+        'subject', 'posts_count', 'last_post_id', 'last_updated', 'last_edited'
+    ).first())
+
+
+def topic_posts_version(request, pk, topic_pk):
+    return state_version(topic_pk, topic_row(request, pk, topic_pk))
+
+
+def topic_posts_last_modified(request, pk, topic_pk):
+    dates = (topic_row(request, pk, topic_pk) or ())[3:]
+    return max([date for date in dates if date is not None], default=None)
+
+
+def page_conditions(get_version, last_modified=None):
+    # conditional GET first, a 304 is cheaper than a page from the cache
+    return [
+        condition(
+            etag_func=lambda request, *args, **kwargs: page_etag(request, get_version(request, *args, **kwargs)),
+            last_modified_func=last_modified
+        ),
+        anonymous_page_cache(get_version),
+    ]
+
+
 # Create your views here.
+@method_decorator(page_conditions(home_version), name='get')
+@method_decorator(replica_view, name='dispatch')
 class BoardListView(ListView):
     model = Board
     context_object_name = 'boards'
     template_name = 'home.html'
 
+    # the counters are stored on the board, so the whole page is one query,
+    # shared with home_version
+    def get_queryset(self):
+        return home_boards(self.request)
+
+    # the table is cached in home.html until a topic or post is written
+    def get_context_data(self, *, object_list=None, **kwargs):
+        kwargs['fragment_version'] = '{}-{}'.format(fragments.get_version('home'), home_version(self.request))
+        kwargs['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
+        return super().get_context_data(**kwargs)
+
 
 # pk is the keyword argument
-class TopicListView(ListView):
+@method_decorator(page_conditions(board_topics_version, board_topics_last_modified), name='get')
+@method_decorator(replica_view, name='dispatch')
+class TopicListView(KeysetPaginationMixin, ListView):
     model = Topic
     context_object_name = 'topics'
     template_name = 'topics.html'
     paginate_by = 16
+    keyset_ordering = ('-last_updated', '-pk')
+
+    def get_total_count(self):
+        return self.board.topics_count
 
     # how to add stuff to the request context when extending a GCBV.
     def get_context_data(self, *, object_list=None, **kwargs):
         kwargs['board'] = self.board
+        kwargs['fragment_version'] = '{}-{}'.format(
+            fragments.get_version('board', self.board.pk), board_topics_version(self.request, self.board.pk)
+        )
+        kwargs['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
         return super().get_context_data(**kwargs)
 
     def get_queryset(self):
         self.board = get_object_or_404(Board, pk=self.kwargs.get('pk'))
-        queryset = self.board.topics.order_by('-last_updated').annotate(replies=Count('posts') - 1)
+        # the replies and page links come from Topic.posts_count, no COUNT needed
+        queryset = self.board.topics.select_related('starter').order_by(*self.keyset_ordering)
         return queryset
 
 
@@ -57,12 +158,15 @@ def new_topic(request, pk):
             topic = form.save(commit=False)
             topic.board = board
             topic.starter = request.user
-            topic.save()
-            Post.objects.create(
-                message=form.cleaned_data.get('message'),
-                topic=topic,
-                created_by=request.user
-            )
+            # the topic, its first post and the board counters (see
+            # boards/signals.py) are written together or not at all
+            with transaction.atomic():
+                topic.save()
+                Post.objects.create(
+                    message=form.cleaned_data.get('message'),
+                    topic=topic,
+                    created_by=request.user
+                )
             # redirects to the created topic page
             return redirect('topic_posts', pk=pk, topic_pk=topic.pk)
 
@@ -71,30 +175,70 @@ def new_topic(request, pk):
     return render(request, 'new_topic.html', {'board': board, 'form': form})
 
 
-class PostListView(ListView):
+@method_decorator(page_conditions(topic_posts_version, topic_posts_last_modified), name='get')
+@method_decorator(replica_view, name='dispatch')
+class PostListView(KeysetPaginationMixin, ListView):
     model = Post
     context_object_name = 'posts'
     template_name = 'topic_posts.html'
-    paginate_by = 15
+    paginate_by = settings.POSTS_PER_PAGE
+    keyset_ordering = ('created_at', 'pk')
+
+    # only readers of the page count as views, not the clients of the JSON API
+    count_views = True
+
+    def get_total_count(self):
+        return self.topic.posts_count
+
+    # ViewedTopics: To prevent the same user from refreshing the page thereby making
+    # the page count as multiple views. The view is buffered and written later
+    # in a batch, see boards/viewcount.py. It is counted here because a 304 or
+    # a cached page never reaches get(). The cookie is set by
+    # ViewedTopicsMiddleware, after the page cache stored the page.
+    def dispatch(self, request, *args, **kwargs):
+        if self.count_views:
+            request.viewed_topics = ViewedTopics(request)
+            if request.method == 'GET' and request.viewed_topics.add(kwargs.get('topic_pk')):
+                topic_views.increment(kwargs.get('topic_pk'))
+        return super().dispatch(request, *args, **kwargs)
 
-    # session_key:To prevent the same user from refreshing the page thereby making
-    # the page count as multiple views
     def get_context_data(self, *, object_list=None, **kwargs):
-        session_key = 'viewed_topic{}'.format(self.topic.pk)
-        if not self.request.session.get(session_key, False):
-            self.topic.views += 1
-            self.topic.save()
-            self.request.session[session_key] = True
-
         kwargs['topic'] = self.topic
+        kwargs['fragment_version'] = '{}-{}'.format(
+            fragments.get_version('topic', self.topic.pk),
+            topic_posts_version(self.request, self.kwargs.get('pk'), self.topic.pk)
+        )
+        kwargs['fragment_timeout'] = settings.FRAGMENT_CACHE_TIMEOUT
         return super().get_context_data(**kwargs)
 
     def get_queryset(self):
-        self.topic = get_object_or_404(Topic, board__pk=self.kwargs.get('pk'), pk=self.kwargs.get('topic_pk'))
-        queryset = self.topic.posts.order_by('created_at')
+        self.topic = get_object_or_404(
+            Topic.objects.select_related('board'),
+            board__pk=self.kwargs.get('pk'),
+            pk=self.kwargs.get('topic_pk')
+        )
+        # the authors and their post counts (Profile.posts_count) come in the
+        # same query. The queryset stays lazy, so it isn't run at all when
+        # topic_posts.html is cached.
+        queryset = self.topic.posts.select_related('created_by__profile').order_by(*self.keyset_ordering)
         return queryset
 
 
+# the new posts of a topic as server-sent events, see boards/events.py
+def topic_events(request, pk, topic_pk):
+    topic = get_object_or_404(Topic.objects.select_related('board'), board__pk=pk, pk=topic_pk)
+    last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    response = StreamingHttpResponse(events.stream_topic(topic, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would buffer the events otherwise
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @method_decorator(login_required, name='dispatch')
 class UserUpdateView(UpdateView):
     model = User
@@ -110,18 +254,21 @@ class UserUpdateView(UpdateView):
 # to the keyword argument of the function
 @login_required
 def reply_topic(request, pk, topic_pk):
-    topic = get_object_or_404(Topic, board__pk=pk, pk=topic_pk)
+    topic = get_object_or_404(Topic.objects.select_related('board'), board__pk=pk, pk=topic_pk)
     if request.method == 'POST':
         form = PostForm(request.POST)
         if form.is_valid():
             post = form.save(commit=False)
             post.topic = topic
             post.created_by = request.user
-            post.save()
-
-            topic.last_updated = timezone.now()
-            topic.save()
-
+            # the post, the topic and board counters and the topic's
+            # last_updated are written together (see boards/signals.py)
+            with transaction.atomic():
+                post.save()
+            events.publish_post(post)
+
+            # topic.posts_count was updated by Topic.record_post, the page
+            # comes from it instead of a COUNT
             topic_url = reverse('topic_posts', kwargs={'pk': pk, 'topic_pk': topic_pk})
             topic_post_url = '{url}?page={page}#{id}'.format(
                 url=topic_url,
@@ -135,6 +282,17 @@ def reply_topic(request, pk, topic_pk):
     return render(request, 'reply_topic.html', {'topic': topic, 'form': form})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    boards = Board.objects.order_by('name')
+    board = None
+    # anything but a board pk searches every board
+    if request.GET.get('board', '').isdigit():
+        board = get_object_or_404(Board, pk=request.GET['board'])
+    posts = search_posts(query, board=board) if query else []
+    return render(request, 'search.html', {'query': query, 'board': board, 'boards': boards, 'posts': posts})
+
+
 @method_decorator(login_required, name='dispatch')
 class PostUpdateView(UpdateView):
     model = Post
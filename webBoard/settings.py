@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 from decouple import config, Csv
 import dj_database_url
 
@@ -52,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'boards.middleware.RequestMetricsMiddleware',
+    'boards.middleware.ReplicaStickinessMiddleware',
+    'boards.middleware.ViewedTopicsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -66,7 +70,8 @@ ROOT_URLCONF = 'webBoard.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates timing the rendering for the request metrics
+        'BACKEND': 'boards.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')]
         ,
         'APP_DIRS': True,
@@ -91,9 +96,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # seconds a connection is kept open between requests, 0 closes it
+        # after every request. Every thread of a gunicorn gthread worker
+        # (see the Procfile) keeps its own, up to workers * WEB_THREADS
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_URLS=postgres://replica1/boards,postgres://replica2/boards.
+# The list views read from them, see boards/routers.py. In tests they mirror
+# the default database.
+DATABASE_REPLICAS = []
+for i, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    alias = 'replica{}'.format(i + 1)
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=DATABASES['default']['CONN_MAX_AGE'])
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['boards.routers.ReplicaRouter']
+
+# seconds a client reads from the primary after it wrote, so it sees its writes
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+# applied to every new SQLite connection by boards/signals.py. WAL lets the
+# readers go on while a worker writes, and writers wait for the lock for
+# busy_timeout milliseconds instead of failing with "database is locked".
+# synchronous=NORMAL is safe with WAL, a power loss can only lose the last
+# transactions. mmap_size is in bytes.
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -140,6 +177,13 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
 
+# uploaded avatars and their thumbnails, see accounts/avatars.py
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'avatars'))
+MEDIA_URL = '/avatars/'
+
+# widths in pixels of the avatar thumbnails
+AVATAR_SIZES = (40, 80, 160, 320)
+
 # passes the name of the URL pattern we want to redirect the user after the log out.
 LOGOUT_REDIRECT_URL = 'login'
 
@@ -150,3 +194,81 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 LOGIN_URL = 'login'
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# The cached fragments and pages are invalidated through this cache, so with
+# several processes it must be shared by all of them (LocMemCache isn't).
+CACHES = {
+    'default': {
+        # LocMemCache per process, or e.g. FileBasedCache with CACHE_LOCATION=/var/tmp/boards
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# seconds a cached fragment of the board, topic and post lists is kept,
+# writes invalidate them earlier (see boards/fragments.py)
+FRAGMENT_CACHE_TIMEOUT = config('FRAGMENT_CACHE_TIMEOUT', default=120, cast=int)
+
+# seconds whole pages are cached for logged out users, 0 turns it off
+# (see boards/pagecache.py)
+ANONYMOUS_PAGE_CACHE_TIMEOUT = config('ANONYMOUS_PAGE_CACHE_TIMEOUT', default=0, cast=int)
+
+# 'offset' for page numbers, 'keyset' for cursors (see boards/pagination.py)
+PAGINATION_MODE = config('PAGINATION_MODE', default='offset')
+
+# full text search: 'auto' picks FTS5 on SQLite and tsvector on PostgreSQL,
+# 'simple' is the in-process index (see boards/search.py)
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='auto')
+
+# posts per page of a topic, used by PostListView and the page links of the topics
+POSTS_PER_PAGE = 15
+
+# 'django.contrib.sessions.backends.signed_cookies' keeps the sessions out of
+# the database altogether. Anonymous readers don't get a session, see
+# ViewedTopics in boards/viewcount.py.
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
+# how many viewed topics a browser remembers, so a reload isn't another view
+VIEWED_TOPICS_MAX = 100
+VIEWED_TOPICS_COOKIE_AGE = 30 * 24 * 60 * 60  # seconds
+
+# topic views are buffered per process and written in batches, see boards/viewcount.py
+TOPIC_VIEWS_FLUSH_INTERVAL = config('TOPIC_VIEWS_FLUSH_INTERVAL', default=10, cast=int)  # seconds
+TOPIC_VIEWS_FLUSH_SIZE = config('TOPIC_VIEWS_FLUSH_SIZE', default=500, cast=int)
+
+# threads per gunicorn worker, see the Procfile
+WEB_THREADS = config('WEB_THREADS', default=8, cast=int)
+
+# live topic updates, see boards/events.py. A stream holds a thread for
+# as long as it is open, by default half of them can be streams and the
+# other readers poll every TOPIC_EVENTS_POLL_SECONDS. 0 streams to no one.
+TOPIC_EVENTS_MAX_LISTENERS = config('TOPIC_EVENTS_MAX_LISTENERS', default=WEB_THREADS // 2, cast=int)
+TOPIC_EVENTS_STREAM_SECONDS = config('TOPIC_EVENTS_STREAM_SECONDS', default=60, cast=int)
+TOPIC_EVENTS_POLL_SECONDS = config('TOPIC_EVENTS_POLL_SECONDS', default=30, cast=int)
+TOPIC_EVENTS_KEEPALIVE_SECONDS = 15
+TOPIC_EVENTS_RETRY_SECONDS = 5
+
+# per request metrics, see boards/middleware.py and boards/metrics.py
+# the Server-Timing header shows the internal timings to every client, so
+# it is only on in development unless asked for
+REQUEST_METRICS_SERVER_TIMING = config('REQUEST_METRICS_SERVER_TIMING', default=DEBUG, cast=bool)
+REQUEST_METRICS_DIR = config('REQUEST_METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'webBoard-metrics'))
+REQUEST_METRICS_SNAPSHOT_INTERVAL = config('REQUEST_METRICS_SNAPSHOT_INTERVAL', default=30, cast=int)  # seconds
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # INFO logs a line per request
+        'boards.metrics': {
+            'handlers': ['console'],
+            'level': config('REQUEST_METRICS_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
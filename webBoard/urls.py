@@ -7,7 +7,7 @@ from django.contrib.auth import views as auth_views
 # for signup
 from accounts import views as accounts_views
 
-from boards import views as board_views
+from boards import api as board_api, views as board_views
 
 
 urlpatterns = [
@@ -53,11 +53,21 @@ urlpatterns = [
 
 
     path('boards/', board_views.BoardListView.as_view(), name='home'),
+    path('boards/search/', board_views.search, name='search'),
     path('boards/<int:pk>/', board_views.TopicListView.as_view(), name='board_topics'),
     path('boards/<int:pk>/new', board_views.new_topic, name='new_topic'),
     path('boards/<int:pk>/topics/<int:topic_pk>', board_views.PostListView.as_view(), name='topic_posts'),
     path('boards/<int:pk>/topics/<int:topic_pk>/reply', board_views.reply_topic, name='reply_topic'),
+    path('boards/<int:pk>/topics/<int:topic_pk>/events', board_views.topic_events, name='topic_events'),
     path('boards/<int:pk>/topics/<int:topic_pk>/posts/<int:post_pk>/edit/', board_views.PostUpdateView.as_view(), name='edit_post'),
+    # read only JSON API, see boards/api.py
+    path('boards/api/boards/', board_api.BoardListAPIView.as_view(), name='api_boards'),
+    path('boards/api/boards/<int:pk>/topics/', board_api.TopicListAPIView.as_view(), name='api_board_topics'),
+    path('boards/api/boards/<int:pk>/topics/<int:topic_pk>/posts/', board_api.PostListAPIView.as_view(),
+         name='api_topic_posts'),
     path('boards/settings/account', board_views.UserUpdateView.as_view(), name='my_account'),
+    path('boards/settings/avatar', accounts_views.avatar, name='avatar'),
+    # MEDIA_URL + 'thumbs/', see accounts/avatars.py
+    path('avatars/thumbs/<str:name>', accounts_views.avatar_thumbnail, name='avatar_thumbnail'),
 
 ]
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/2.1/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -16,3 +17,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webBoard.settings')
 
 application = get_wsgi_application()
 application = WhiteNoise(application)
+
+# write the topic views still buffered in this worker before it exits
+from boards.viewcount import flush_on_exit  # noqa: E402
+atexit.register(flush_on_exit)
+
+
+# and the request metrics it collected, see boards/metrics.py
+from boards.metrics import registry  # noqa: E402
+atexit.register(registry.snapshot)